@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import os
 import sqlite3
 import argparse
 import shutil
@@ -8,6 +9,109 @@ from pathlib import Path
 from datetime import datetime
 
 DEFAULT_LIBRARY_PATH = "/home/thiago/Onedrive/Ebooks Vault"
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent.parent
+# Full-text index over title/author/tags lives in a sidecar DB so Calibre's
+# own metadata.db is never modified.
+FTS_DB_PATH = REPO_ROOT / "datasets" / "calibre_fts.db"
+# Used for both the output folder slug and every copied file name.
+_NON_ALNUM = re.compile(r'[^a-zA-Z0-9]')
+
+
+# Read-side tuning for the large metadata.db. Journal settings are deliberately
+# left alone: Calibre owns that file and must not be flipped to WAL.
+READ_PRAGMAS = """
+PRAGMA mmap_size = 1073741824;
+PRAGMA cache_size = -131072;
+PRAGMA temp_store = MEMORY;
+"""
+
+
+def _library_fingerprint(conn, db_path):
+    """Cheap signature of the library contents; changes whenever books, authors or tags change.
+
+    Counts alone miss edits in place (renaming an author or tag, relinking a book
+    to another author), so metadata.db's own mtime and size are part of it too:
+    Calibre writes through a rollback journal, so every commit touches the file.
+    """
+    st = os.stat(db_path)
+    row = conn.execute(
+        """
+        SELECT
+            (SELECT COUNT(*) FROM books),
+            (SELECT MAX(last_modified) FROM books),
+            (SELECT COUNT(*) FROM books_authors_link),
+            (SELECT COUNT(*) FROM books_tags_link)
+        """
+    ).fetchone()
+    return "|".join(str(v) for v in (*row, st.st_mtime_ns, st.st_size))
+
+
+def ensure_fts(conn, db_path):
+    """Attach the FTS5 sidecar as schema `fts`, (re)building it if the library changed."""
+    FTS_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn.execute("ATTACH DATABASE ? AS fts", (str(FTS_DB_PATH),))
+    conn.execute("CREATE TABLE IF NOT EXISTS fts.fts_meta (key TEXT PRIMARY KEY, value TEXT)")
+    stamp = f"{Path(db_path).resolve()}|{_library_fingerprint(conn, db_path)}"
+    current = conn.execute("SELECT value FROM fts.fts_meta WHERE key = 'stamp'").fetchone()
+    if current and current[0] == stamp:
+        return
+
+    print("Building full-text index (first run or library changed)...")
+    conn.execute("DROP TABLE IF EXISTS fts.books_fts")
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE fts.books_fts USING fts5(
+            title, author, tags,
+            content='',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO fts.books_fts(rowid, title, author, tags)
+        SELECT
+            b.id,
+            b.title,
+            (SELECT GROUP_CONCAT(a.name, ' ') FROM books_authors_link bal
+                JOIN authors a ON bal.author = a.id WHERE bal.book = b.id),
+            (SELECT GROUP_CONCAT(t.name, ' ') FROM books_tags_link btl
+                JOIN tags t ON btl.tag = t.id WHERE btl.book = b.id)
+        FROM books b
+        """
+    )
+    conn.execute("INSERT OR REPLACE INTO fts.fts_meta (key, value) VALUES ('stamp', ?)", (stamp,))
+    conn.commit()
+    conn.execute("ANALYZE fts")
+
+
+def fts_term(column, text):
+    """Quote `text` as an FTS5 prefix phrase on `column` (approximates LIKE '%text%' per token)."""
+    escaped = text.replace('"', '""')
+    return f'{column} : "{escaped}" *'
+
+
+def fast_copy(src, dst):
+    """Copy `src` to `dst` in-kernel via copy_file_range where available, else shutil.copy2."""
+    if not hasattr(os, "copy_file_range"):
+        shutil.copy2(src, dst)
+        return
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # e.g. cross-filesystem on older kernels, or unsupported filesystem.
+        shutil.copy2(src, dst)
+        return
+    shutil.copystat(src, dst)
+
 
 def main():
     parser = argparse.ArgumentParser(description="Retrieve books from Calibre library.")
@@ -36,12 +140,11 @@ def main():
     if args.lang: parts.append(args.lang)
     
     slug = "_".join(parts) if parts else "all_books"
-    slug = re.sub(r'[^a-zA-Z0-9]', '_', slug).lower()
+    slug = _NON_ALNUM.sub('_', slug).lower()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     folder_name = f"{slug}_{timestamp}"
     
-    repo_root = Path(__file__).resolve().parent.parent.parent.parent
-    dest_dir = repo_root / "input_books" / "libraries" / folder_name
+    dest_dir = REPO_ROOT / "input_books" / "libraries" / folder_name
     dest_dir.mkdir(parents=True, exist_ok=True)
     
     print(f"Destination: {dest_dir}")
@@ -49,115 +152,125 @@ def main():
     # Connect DB
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
+    conn.executescript(READ_PRAGMAS)
     
     # Build Query
-    # We SELECT distinct book details. 
-    # We join identifiers to get goodreads id.
-    query_parts = ["SELECT b.id, b.title, b.path, i.val as goodreads_id FROM books b"]
+    # One row per book: identifiers is UNIQUE(book, type) and data is
+    # UNIQUE(book, format), so the LEFT JOINs below cannot fan out and no
+    # GROUP BY (with its temp B-tree sort) is needed. The TXT file name comes
+    # from the same pass (no per-book follow-up query); the format list for the
+    # skip diagnostics rides along as a correlated subquery, evaluated only for
+    # rows actually returned.
+    query_parts = [
+        "SELECT b.id, b.title, b.path, i.val as goodreads_id, d.name as txt_name,"
+        " (SELECT GROUP_CONCAT(df.format) FROM data df WHERE df.book = b.id) as formats"
+        " FROM books b"
+    ]
     query_parts.append("LEFT JOIN identifiers i ON b.id = i.book AND i.type='goodreads'")
+    query_parts.append("LEFT JOIN data d ON b.id = d.book AND d.format='TXT'")
     
+    # Filters are `b.id IN (subquery)` semi-joins, so a book matching several
+    # languages (or tags) is still produced once.
     where_clauses = []
     params = []
-    
-    joins = set()
-    
-    if args.author:
-        # Check authors table? Or easier: query books.author_sort or link to authors
-        # For better matching, let's use books_authors_link + authors
-        joins.add("JOIN books_authors_link bal ON b.id = bal.book")
-        joins.add("JOIN authors a ON bal.author = a.id")
-        where_clauses.append("a.name LIKE ?")
-        params.append(f"%{args.author}%")
 
+    # Author/title/tag filters go through the FTS index as a single MATCH
+    # instead of leading-wildcard LIKE scans.
+    fts_terms = []
+    if args.author:
+        fts_terms.append(fts_term("author", args.author))
     if args.title:
-        where_clauses.append("b.title LIKE ?")
-        params.append(f"%{args.title}%")
-        
+        fts_terms.append(fts_term("title", args.title))
     if args.tag:
-        joins.add("JOIN books_tags_link btl ON b.id = btl.book")
-        joins.add("JOIN tags t ON btl.tag = t.id")
-        where_clauses.append("t.name LIKE ?")
-        params.append(f"%{args.tag}%")
+        fts_terms.append(fts_term("tags", args.tag))
+
+    if fts_terms:
+        ensure_fts(conn, db_path)
+        where_clauses.append("b.id IN (SELECT rowid FROM fts.books_fts WHERE books_fts MATCH ?)")
+        params.append(" AND ".join(fts_terms))
         
     if args.lang:
-        joins.add("JOIN books_languages_link bll ON b.id = bll.book")
-        joins.add("JOIN languages l ON bll.lang_code = l.id")
-        where_clauses.append("l.lang_code LIKE ?")
+        where_clauses.append(
+            "b.id IN (SELECT bll.book FROM books_languages_link bll"
+            " JOIN languages l ON bll.lang_code = l.id WHERE l.lang_code LIKE ?)"
+        )
         params.append(f"%{args.lang}%")
 
     # Construct complete query
     full_sql = " ".join(query_parts)
-    for j in joins:
-        full_sql += f" {j}"
         
     if where_clauses:
         full_sql += " WHERE " + " AND ".join(where_clauses)
         
-    full_sql += " GROUP BY b.id" # Deduplicate if multiple matches
+    # Over-fetch 2x so books skipped for lacking a TXT can still be back-filled
+    # up to --limit; SQLite stops producing rows past this point.
+    full_sql += " LIMIT ?"
+    params.append(args.limit * 2)
     
+    # Any index maintenance is done by now; the rest of the run only reads.
+    conn.execute("PRAGMA query_only = ON")
     print(f"Querying DB...")
     
-    # ... (execution) ...
-
+    # Rows are streamed from the cursor rather than materialised with fetchall().
     try:
         cursor = conn.execute(full_sql, params)
-        rows = cursor.fetchall()
     except sqlite3.OperationalError as e:
         print(f"SQL Error: {e}")
         sys.exit(1)
-        
-    print(f"Found {len(rows)} potential matches.")
     
+    matched_count = 0
     copied_count = 0
     missing_txt_count = 0
     
-    for row in rows:
+    for row in cursor:
         if copied_count >= args.limit:
             break
+        matched_count += 1
             
-        book_id = row['id']
         title = row['title']
         rel_path = row['path']
         goodreads_id = row['goodreads_id']
         
         book_dir = lib_path / rel_path
         
-        # Check for TXT format
-        data_rows = conn.execute("SELECT name, format FROM data WHERE book=?", (book_id,)).fetchall()
-        
-        txt_file = None
-        for dr in data_rows:
-            if dr['format'] == 'TXT':
-                fname = f"{dr['name']}.txt"
-                fpath = book_dir / fname
-                if fpath.exists():
-                    txt_file = fpath
-                    break
-        
-        if txt_file:
+        # Check for TXT format. No exists() stat up front: the copy opens the
+        # source anyway, and a missing file surfaces there as FileNotFoundError.
+        copied = False
+        if row['txt_name']:
+            txt_file = book_dir / f"{row['txt_name']}.txt"
+
             # Determine Output Filename
             # Sanitize title
-            safe_title = re.sub(r'[^a-zA-Z0-9]', '_', title)
+            safe_title = _NON_ALNUM.sub('_', title)
             
             if goodreads_id:
                 # Format: Title_12345.txt
                 out_name = f"{safe_title}_{goodreads_id}.txt"
             else:
                 # Format: Title.txt (Warning: this might miss the ID in pipeline)
-                print(f"  [WARN] Book '{title}' has no Goodreads ID in Calibre.")
                 out_name = f"{safe_title}.txt"
                 
             dest_path = dest_dir / out_name
             
+            try:
+                fast_copy(txt_file, dest_path)
+                copied = True
+            except FileNotFoundError:
+                pass
+
+        if copied:
+            if not goodreads_id:
+                print(f"  [WARN] Book '{title}' has no Goodreads ID in Calibre.")
             print(f"  [COPY] {title} -> {out_name}")
-            shutil.copy2(txt_file, dest_path)
             copied_count += 1
         else:
             print(f"  [SKIP] {title} (No TXT)")
-            print(f"         Debug: Formats found: {[r['format'] for r in data_rows]}")
+            formats = row['formats'].split(',') if row['formats'] else []
+            print(f"         Debug: Formats found: {formats}")
             missing_txt_count += 1
             
     print("-" * 40)
+    print(f"Examined: {matched_count}")
     print(f"Copied: {copied_count}")
     print(f"Skipped (No TXT): {missing_txt_count}")
     print(f"Output Directory: {dest_dir}")
@@ -1,16 +1,107 @@
 #!/usr/bin/env python3
 import sqlite3
 import argparse
+import hashlib
 import json
 import sys
 from pathlib import Path
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def json_dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# Repeated lookups are answered from a small sidecar DB next to the index,
+# keyed by the normalized query; the index DB itself stays read-only.
+CACHE_FILENAME = "lookup_cache.db"
+CACHE_MAX_ROWS = 10_000
+
+# The index is only ever read here: map it, keep a large page cache, and
+# refuse writes.
+READ_PRAGMAS = """
+PRAGMA mmap_size = 1073741824;
+PRAGMA cache_size = -131072;
+PRAGMA temp_store = MEMORY;
+PRAGMA query_only = ON;
+"""
+
+
+def fts_phrase(column, text):
+    """Quote `text` as an FTS5 phrase restricted to `column` (embedded quotes doubled)."""
+    escaped = text.replace('"', '""')
+    return f'{column} : "{escaped}"'
+
+
+def cache_key(db_path, title, author, limit):
+    """16-byte digest of the normalized query, tied to the index file's mtime."""
+    stamp = f"{db_path.resolve()}|{db_path.stat().st_mtime_ns}"
+    raw = "\x1f".join([stamp, title.lower(), (author or "").lower(), str(limit)])
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+
+
+def open_cache(db_path):
+    """Open (creating if needed) the lookup cache beside the index; None if unwritable."""
+    try:
+        conn = sqlite3.connect(db_path.parent / CACHE_FILENAME)
+        conn.execute("CREATE TABLE IF NOT EXISTS lookup_cache (key BLOB PRIMARY KEY, payload BLOB)")
+        return conn
+    except sqlite3.Error:
+        return None
+
+
+def cache_get(cache, key):
+    if cache is None:
+        return None
+    row = cache.execute("SELECT payload FROM lookup_cache WHERE key = ?", (key,)).fetchone()
+    return json_loads(row[0]) if row else None
+
+
+def cache_put(cache, key, results):
+    if cache is None:
+        return
+    try:
+        cache.execute(
+            "INSERT OR REPLACE INTO lookup_cache (key, payload) VALUES (?, ?)",
+            (key, json_dumps(results)),
+        )
+        overflow = cache.execute("SELECT COUNT(*) FROM lookup_cache").fetchone()[0] - CACHE_MAX_ROWS
+        if overflow > 0:
+            # Oldest entries first (rowid grows with insertion order).
+            cache.execute(
+                "DELETE FROM lookup_cache WHERE rowid IN "
+                "(SELECT rowid FROM lookup_cache ORDER BY rowid LIMIT ?)",
+                (overflow,),
+            )
+        cache.commit()
+    except sqlite3.Error:
+        pass
+
+
+def print_results(results):
+    print(f"\nFound {len(results)} matches:\n")
+    for i, book in enumerate(results):
+        print(f"{i+1}. {book.get('title')} (ID: {book.get('book_id')})")
+        print(f"   Authors: {book.get('authors')}")
+        print(f"   Year: {book.get('publication_year')}")
+        print("-" * 30)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Lookup Goodreads Book ID")
     parser.add_argument("--title", required=True, help="Title of the book")
     parser.add_argument("--author", help="Author of the book")
     parser.add_argument("--limit", type=int, default=10, help="Max results")
     parser.add_argument("--db-path", default="datasets/books_index.db", help="Path to SQLite DB")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the persistent lookup cache")
     
     args = parser.parse_args()
     
@@ -26,6 +117,7 @@ def main():
     try:
         conn = sqlite3.connect(db_path)
         conn.row_factory = sqlite3.Row
+        conn.executescript(READ_PRAGMAS)
     except Exception as e:
          print(f"Error connecting to DB: {e}")
          sys.exit(1)
@@ -35,75 +127,64 @@ def main():
     
     print(f"Searching for Title='{title_query}', Author='{author_query}'...")
 
+    cache = None if args.no_cache else open_cache(db_path)
+    key = cache_key(db_path, title_query, author_query, args.limit)
+    cached = cache_get(cache, key)
+    if cached is not None:
+        print_results(cached)
+        return
+
     results = []
 
-    # 1. Author + Title Search (FTS on authors, filter on title)
+    # 1. Author + Title Search (single compound FTS query)
     if author_query:
-        # FTS on authors column
-        # Note: input needs to be sanitized for FTS query syntax if complex, 
-        # but for simple names standard implementation usually works or use param binding if possible.
-        # SQLite FTS MATCH doesn't support binding the match string safely easily without creating the string first.
-        # We quote it to be safe-ish.
-        fts_query = f'authors : "{author_query}"'
-        
+        # Both columns are in books_fts, so one MATCH does the filtering and
+        # bm25 ranking; only the final `limit` rows are JSON-decoded.
+        fts_query = f"{fts_phrase('authors', author_query)} AND {fts_phrase('title', title_query)}"
         sql = """
-        SELECT data FROM books_fts 
-        WHERE books_fts MATCH ? 
-        LIMIT 100
+        SELECT data FROM books_fts
+        WHERE books_fts MATCH ?
+        ORDER BY bm25(books_fts)
+        LIMIT ?
         """
         try:
-            rows = conn.execute(sql, (fts_query,)).fetchall()
+            rows = conn.execute(sql, (fts_query, args.limit)).fetchall()
             for row in rows:
                 try:
-                    data = json.loads(row['data'])
-                    t = data.get('title', '')
-                    if title_query.lower() in t.lower():
-                        results.append(data)
-                except:
+                    results.append(json_loads(row['data']))
+                except json.JSONDecodeError:
                     continue
         except sqlite3.OperationalError as e:
             print(f"FTS Error (Author): {e}")
 
     # 2. Relaxed Title-only Search (if no author or no results)
     if not results and not author_query:
-        # If no author provided, we must rely on title search.
-        # But books_fts is indexed heavily on authors?
-        # Let's check schema/setup. Usually FTS is across columns or specific columns.
-        # Assuming we can match on title if it is in the FTS index.
-        # If 'data' is the only column, maybe we can't easily FTS title?
-        
-        # Fallback: simple LIKE query on the main table if FTS fails or isn't built for titles
-        # But per debug_search.py, it executes `SELECT data FROM books_fts WHERE books_fts MATCH ...`
-        # If titles are not indexed in FTS, this is hard.
-        # Let's assume title is indexed or use a LIKE on books table if it exists.
-        
-        # Checking debug_search.py again: it ONLY queried authors in FTS.
-        # Does the DB have a `books` table?
-        # debug_search.py: `conn.execute(sql, (fts_query,))` where sql select from books_fts
-        
-        # Let's try to query the `books` table if exists for simple LIKE
+        # books_fts indexes `title`, so this is an FTS probe rather than a
+        # LIKE '%q%' scan of the books table. The JSON blob is stored
+        # (UNINDEXED) alongside, so no second lookup is needed.
+        fts_query = fts_phrase('title', title_query)
         try:
-            sql = "SELECT data FROM books WHERE title LIKE ? LIMIT ?"
-            rows = conn.execute(sql, (f"%{title_query}%", args.limit)).fetchall()
+            rows = conn.execute(
+                "SELECT data FROM books_fts WHERE books_fts MATCH ? ORDER BY rank LIMIT ?",
+                (fts_query, args.limit),
+            ).fetchall()
+            # The phrase MATCH already requires the title tokens in order, so
+            # every row is kept; a substring check after LIMIT would only
+            # shrink the page below `limit`.
             for row in rows:
-                results.append(json.loads(row['data']))
-        except Exception:
-            # Maybe books table doesn't have title column separated?
-            pass
+                try:
+                    results.append(json_loads(row['data']))
+                except json.JSONDecodeError:
+                    continue
+        except sqlite3.OperationalError as e:
+            print(f"FTS Error (Title): {e}")
 
 
-    # Sort by rough relevance (exact title match?)
-    # Simple heuristic
-    results.sort(key=lambda x: len(x.get('title', ''))) 
-    
+    # Results arrive in FTS rank order already.
     results = results[:args.limit]
 
-    print(f"\nFound {len(results)} matches:\n")
-    for i, book in enumerate(results):
-        print(f"{i+1}. {book.get('title')} (ID: {book.get('book_id')})")
-        print(f"   Authors: {book.get('authors')}")
-        print(f"   Year: {book.get('publication_year')}")
-        print("-" * 30)
+    cache_put(cache, key, results)
+    print_results(results)
 
 if __name__ == "__main__":
     main()
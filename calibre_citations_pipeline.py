@@ -17,14 +17,19 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import hashlib
 import json
 import os
+import signal
 import sqlite3
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Set
 import logging
+from lib.json_utils import loads as json_loads, write_json
 from lib.logging_config import setup_logging
 from lib.main_pipeline import BookPipeline, PipelineConfig
 
@@ -35,8 +40,35 @@ try:
 except ImportError:  # pragma: no cover
     tqdm = None
 
+# Read-side tuning for the SQLite files this script only reads (Calibre's
+# metadata.db, the Goodreads index). Both are opened read-only: Calibre owns
+# metadata.db, so neither its journal mode nor its schema is touched.
+READ_PRAGMAS = """
+PRAGMA mmap_size = 268435456;
+PRAGMA cache_size = -65536;
+PRAGMA temp_store = MEMORY;
+"""
+
+# Goodreads ids are bound as one JSON array and joined against the primary
+# key: one fixed statement for any number of ids, no bound-parameter limit.
+BOOKS_BY_ID_SQL = """
+    SELECT b.* FROM json_each(?) AS ids
+    CROSS JOIN books AS b ON b.book_id = ids.value
+"""
+
+# Stage-4 output folder of BookPipeline.run_file; a book with a file here is done.
+FINAL_DIR_NAME = "final_citations_metadata_goodreads"
+
+# Book directories listed concurrently while loading the library. Listing is
+# pure I/O latency (a round trip per directory on NFS/SMB shares), so threads
+# overlap it without contending for the GIL.
+LISTDIR_WORKERS = 16
+# Listings submitted ahead of the row being consumed; bounds the rows and
+# futures held at once so the metadata.db scan still streams.
+LISTDIR_WINDOW = LISTDIR_WORKERS * 4
 
-@dataclass
+
+@dataclass(slots=True)
 class CalibreBook:
     calibre_id: int
     title: str
@@ -48,62 +80,101 @@ class CalibreBook:
     description: Optional[str] = None
 
 
+def _list_dir(path: str) -> Set[str]:
+    try:
+        return set(os.listdir(path))
+    except OSError:
+        return set()
+
+
+def _listed_rows(rows, library_root: str, pool: ThreadPoolExecutor, window: int = LISTDIR_WINDOW):
+    """Yield (row, directory entries) in row order, with at most `window` listings in flight."""
+    pending = deque()
+    for row in rows:
+        pending.append((row, pool.submit(_list_dir, os.path.join(library_root, row["path"]))))
+        if len(pending) >= window:
+            row, listing = pending.popleft()
+            yield row, listing.result()
+    while pending:
+        row, listing = pending.popleft()
+        yield row, listing.result()
+
+
 def load_calibre_books(library_dir: Path, allowed_goodreads_ids: Optional[Set[str]] = None) -> List[CalibreBook]:
     """Load Calibre metadata, focusing on books with a Goodreads identifier and TXT format."""
     db_path = library_dir / "metadata.db"
     if not db_path.exists():
         raise FileNotFoundError(f"No metadata.db found at {db_path}")
 
-    conn = sqlite3.connect(db_path)
+    # as_uri() percent-encodes library paths containing spaces, '?' or '#'.
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(READ_PRAGMAS)
     cur = conn.cursor()
-    cur.execute(
-        """
+    # One row per book: the TXT filter lives in the data join, and Calibre keeps
+    # data UNIQUE(book, format), identifiers UNIQUE(book, type) and comments
+    # UNIQUE(book), so none of the joins can fan out. Those unique indexes plus
+    # Calibre's own formats_idx already make every join an index search, so no
+    # extra indexes are created. The id is cast and the description trimmed
+    # (of the whitespace str.strip() drops) in SQL, so rows arrive normalized.
+    query = """
         SELECT
-            b.id,
+            b.id AS calibre_id,
             b.title,
             b.author_sort,
             b.path,
             d.name,
-            d.format,
-            i.val as goodreads_id,
-            c.text as description
+            CAST(i.val AS TEXT) AS goodreads_id,
+            TRIM(NULLIF(c.text, ''), char(32, 9, 10, 11, 12, 13)) AS description
         FROM books b
         JOIN identifiers i ON i.book = b.id AND i.type = 'goodreads'
-        LEFT JOIN data d ON d.book = b.id
+        JOIN data d ON d.book = b.id AND d.format = 'TXT'
         LEFT JOIN comments c ON c.book = b.id
-        """
-    )
-    rows = cur.fetchall()
-    conn.close()
+        WHERE i.val IS NOT NULL AND i.val != ''
+    """
+    params: List[str] = []
+    if allowed_goodreads_ids is not None:
+        # The allow-list is bound as one JSON array, so the statement is the
+        # same for any list size and never hits the bound-parameter limit.
+        query += " AND i.val IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(sorted(allowed_goodreads_ids)))
 
     books: List[CalibreBook] = []
-    for calibre_id, title, author_sort, rel_path, name, fmt, goodreads_id, description in rows:
-        if not goodreads_id:
-            # print(f"[calibre] Skipping book {title!r} (Calibre ID {calibre_id}) with no Goodreads ID.")
-            continue
-        if allowed_goodreads_ids is not None and str(goodreads_id) not in allowed_goodreads_ids:
-            continue
-        if fmt != "TXT":
-            # We only process TXT sources in this pipeline.
-            continue
-        book_dir = library_dir / rel_path
-        txt_path = book_dir / f"{name}.txt"
-        epub_path = book_dir / f"{name}.epub"
-        if not txt_path.exists():
-            logger.warning(f"Skipping Goodreads {goodreads_id} ({title}) because TXT not found at {txt_path}")
-            continue
-        books.append(
-            CalibreBook(
-                calibre_id=calibre_id,
-                title=title,
-                author_sort=author_sort,
-                path=book_dir,
-                txt_path=txt_path,
-                epub_path=epub_path if epub_path.exists() else None,
-                goodreads_id=str(goodreads_id),
-                description=(description.strip() if description else None),
-            )
-        )
+    library_root = str(library_dir)
+    try:
+        # Each row's directory listing is submitted as soon as the row comes off
+        # the cursor, so the listings overlap each other and the SQL scan; only
+        # a bounded window of them is ever pending.
+        with ThreadPoolExecutor(max_workers=LISTDIR_WORKERS) as pool:
+            for row, entries in _listed_rows(cur.execute(query, params), library_root, pool):
+                title = row["title"]
+                goodreads_id = row["goodreads_id"]
+                name = row["name"]
+                # One directory listing per book answers both the TXT and EPUB checks
+                # (instead of a stat each); Paths are only built for books we keep.
+                book_dir = os.path.join(library_root, row["path"])
+                txt_name = f"{name}.txt"
+                epub_name = f"{name}.epub"
+                if txt_name not in entries:
+                    logger.warning(
+                        f"Skipping Goodreads {goodreads_id} ({title}) because TXT not found at {os.path.join(book_dir, txt_name)}"
+                    )
+                    continue
+                book_path = Path(book_dir)
+                books.append(
+                    CalibreBook(
+                        calibre_id=row["calibre_id"],
+                        title=title,
+                        author_sort=row["author_sort"],
+                        path=book_path,
+                        txt_path=book_path / txt_name,
+                        epub_path=book_path / epub_name if epub_name in entries else None,
+                        goodreads_id=goodreads_id,
+                        description=row["description"],
+                    )
+                )
+    finally:
+        conn.close()
     return books
 
 
@@ -116,25 +187,32 @@ def load_goodreads_metadata(book_ids: Set[str], db_path: str = "datasets/books_i
         logger.warning(f"Books DB not found at {db_path}, cannot load source metadata.")
         return {}
 
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.executescript(READ_PRAGMAS)
     cur = conn.cursor()
-    
-    placeholders = ",".join("?" for _ in book_ids)
-    query = f"SELECT * FROM books WHERE book_id IN ({placeholders})"
-    
+
     results = {}
     try:
-        cur.execute(query, list(book_ids))
-        for row in cur.fetchall():
-            data = dict(row)
+        cur.execute(BOOKS_BY_ID_SQL, (json.dumps(sorted(map(str, book_ids))),))
+        # Plain tuples: column positions are resolved once from the cursor
+        # instead of by name on every row.
+        columns = [d[0] for d in cur.description]
+        data_idx = columns.index("data")
+        id_idx = columns.index("book_id")
+        extra_columns = [(i, name) for i, name in enumerate(columns) if i != data_idx]
+        for row in cur:
+            # The full Goodreads record lives in the `data` JSON payload; only
+            # the handful of requested rows are ever decoded.
+            data = json_loads(row[data_idx]) if row[data_idx] else {}
+            for i, name in extra_columns:
+                if row[i] is not None:
+                    data.setdefault(name, row[i])
             if isinstance(data.get("authors"), str):
                 try:
-                    data["authors"] = json.loads(data["authors"])
-                except json.JSONDecodeError:
+                    data["authors"] = json_loads(data["authors"])
+                except ValueError:
                     pass
-            results[str(data["book_id"])] = data
-    except Exception as e:
+            results[str(row[id_idx])] = data
     except Exception as e:
         logger.error(f"Error loading Goodreads metadata: {e}")
     finally:
@@ -143,6 +221,102 @@ def load_goodreads_metadata(book_ids: Set[str], db_path: str = "datasets/books_i
     return results
 
 
+def load_goodreads_metadata_cached(
+    book_ids: Set[str], db_path: str, cache_path: Path
+) -> Dict[str, Any]:
+    """load_goodreads_metadata, memoized on disk until the index or the id set changes."""
+    if not book_ids or not os.path.exists(db_path):
+        return load_goodreads_metadata(book_ids, db_path)
+
+    st = os.stat(db_path)
+    fingerprint = f"{st.st_mtime_ns}:{st.st_size}\0{','.join(sorted(book_ids))}"
+    key = hashlib.blake2b(fingerprint.encode("utf-8"), digest_size=16).hexdigest()
+    try:
+        cached = json_loads(cache_path.read_bytes())
+        if cached.get("key") == key:
+            return cached["metadata"]
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass
+
+    results = load_goodreads_metadata(book_ids, db_path)
+    if results:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        write_json(cache_path, {"key": key, "metadata": results}, indent=False)
+    return results
+
+
+class AdmissionController:
+    """Book-level admission gate whose limit can change mid-run.
+
+    A counter guarded by an asyncio.Condition rather than a Semaphore, so the
+    limit can be raised or lowered safely while books are in flight: lowering
+    it lets running books finish and admits no new ones until the count drops
+    below the new limit.
+    """
+
+    def __init__(self, limit: int):
+        self._cond = asyncio.Condition()
+        self._active = 0
+        self._limit = max(1, limit)
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify(1)
+
+    async def set_limit(self, limit: int) -> None:
+        async with self._cond:
+            self._apply_limit(limit)
+
+    async def adjust_limit(self, delta: int) -> None:
+        async with self._cond:
+            self._apply_limit(self._limit + delta)
+
+    def _apply_limit(self, limit: int) -> None:
+        old, self._limit = self._limit, max(1, limit)
+        if self._limit > old:
+            self._cond.notify_all()
+        logger.info(f"Book concurrency limit {old} -> {self._limit}")
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.release()
+
+
+def _install_resize_signals(admission: AdmissionController) -> None:
+    """SIGUSR1 admits one more concurrent book, SIGUSR2 one fewer (POSIX only)."""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    loop = asyncio.get_running_loop()
+    # The loop only keeps weak references to tasks; hold each resize until it
+    # finishes so it cannot be collected mid-flight, and surface its errors.
+    resizes: Set[asyncio.Task] = set()
+
+    def resized(task: asyncio.Task) -> None:
+        resizes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Book concurrency resize failed: {task.exception()!r}")
+
+    def resize(step: int) -> None:
+        task = loop.create_task(admission.adjust_limit(step))
+        resizes.add(task)
+        task.add_done_callback(resized)
+
+    for signum, step in ((signal.SIGUSR1, 1), (signal.SIGUSR2, -1)):
+        loop.add_signal_handler(signum, resize, step)
+
+
 def derive_output_base(library_dir: Path) -> Path:
     return Path("outputs") / "calibre_libs" / library_dir.name
 
@@ -232,6 +406,35 @@ def parse_args() -> argparse.Namespace:
         default=10,
         help="Max concurrent agent workflows.",
     )
+    parser.add_argument(
+        "--agent-citation-timeout",
+        type=float,
+        default=120.0,
+        help="Seconds a single citation's agent workflow may run before it is abandoned (default: 120).",
+    )
+    parser.add_argument(
+        "--agent-autotune",
+        action="store_true",
+        help=(
+            "Adapt agent concurrency to observed throughput, starting at half of "
+            "--agent-max-concurrency and never exceeding it."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help=(
+            "Books to process in parallel (default: 2). They share the agent/extraction "
+            "concurrency limits, so the servers stay busy across book boundaries. "
+            "Send SIGUSR1/SIGUSR2 to raise/lower it by one while running."
+        ),
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the final citations JSON (compact by default).",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
@@ -240,6 +443,26 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+def completed_book_ids(output_base: Path) -> Set[str]:
+    """Goodreads ids whose final stage output already exists under output_base."""
+    try:
+        names = os.listdir(output_base / FINAL_DIR_NAME)
+    except OSError:
+        return set()
+    return {name[: -len(".json")] for name in names if name.endswith(".json")}
+
+
+def _source_metadata(book: CalibreBook, gr_meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Source metadata for a book: Goodreads title/authors, falling back to Calibre's."""
+    return {
+        "title": gr_meta.get("title") or book.title,
+        "authors": gr_meta.get("author_names_resolved") or [book.author_sort],
+        "goodreads_id": book.goodreads_id,
+        "calibre_id": book.calibre_id,
+        "description": book.description
+    }
+
+
 async def run_pipeline(args):
     # Load Books
     if not args.library_dir.exists():
@@ -256,9 +479,31 @@ async def run_pipeline(args):
         logger.warning("No eligible Calibre books found (need TXT format and Goodreads ID); nothing to do.")
         return
 
-    # Load Source Metadata
+    output_base = args.output_dir or derive_output_base(args.library_dir)
+    # The metadata cache is keyed on the id set, so it covers every eligible
+    # book: keyed on what is left after resume, each run with progress would
+    # miss and rewrite it.
     book_ids_needed = {b.goodreads_id for b in books}
-    source_metadata_map = load_goodreads_metadata(book_ids_needed, args.books_db)
+
+    # Resume: books whose final output exists are dropped before anything is
+    # loaded or scheduled for them, so a rerun only pays for what is left.
+    done_ids = completed_book_ids(output_base)
+    if done_ids:
+        remaining = [b for b in books if b.goodreads_id not in done_ids]
+        logger.info(f"Skipping {len(books) - len(remaining)} books already completed in {output_base}.")
+        books = remaining
+        if not books:
+            logger.info("All eligible books are already processed; nothing to do.")
+            return
+
+    # Load Source Metadata (cached under the output dir between runs) on a
+    # worker thread, overlapping it with building the pipeline below.
+    metadata_task = asyncio.create_task(asyncio.to_thread(
+        load_goodreads_metadata_cached,
+        book_ids_needed,
+        args.books_db,
+        output_base / "goodreads_metadata_cache.json",
+    ))
 
     # Initialize Pipeline
     config = PipelineConfig(
@@ -272,6 +517,9 @@ async def run_pipeline(args):
         agent_api_key=args.agent_api_key,
         agent_model=args.agent_model,
         agent_concurrency=args.agent_max_concurrency,
+        agent_citation_timeout=args.agent_citation_timeout,
+        agent_autotune=args.agent_autotune,
+        pretty_output=args.pretty,
         
         books_db=args.books_db,
         authors_json=args.authors_json,
@@ -280,36 +528,44 @@ async def run_pipeline(args):
     )
     
     pipeline = BookPipeline(config)
-    output_base = args.output_dir or derive_output_base(args.library_dir)
     log_file = setup_logging(output_base, verbose=args.verbose or args.debug_trace)
     
     logger.info(f"Starting pipeline for {len(books)} books...")
     logger.info(f"Output Directory: {output_base}")
-    
-    iterator = tqdm(books, desc="Total Progress") if tqdm else books
-    
-    for book in iterator:
-        if tqdm: iterator.set_description(f"Processing {book.title}")
-        
-        # Build source metadata dict
-        gr_meta = source_metadata_map.get(book.goodreads_id, {})
-        source_meta = {
-            "title": gr_meta.get("title") or book.title,
-            "authors": gr_meta.get("author_names_resolved") or [book.author_sort],
-            "goodreads_id": book.goodreads_id,
-            "calibre_id": book.calibre_id,
-            "description": book.description
-        }
-        
-        try:
-            await pipeline.run_file(
-                input_text_path=book.txt_path,
-                output_dir=output_base,
-                source_metadata=source_meta,
-                book_id=book.goodreads_id
-            )
-        except Exception as e:
-            logger.error(f"Failed to process {book.title}: {e}", exc_info=True)
+
+    source_metadata_map = await metadata_task
+    # Finalize every book's source metadata up front; the raw Goodreads rows
+    # are not needed once this is built.
+    source_metas = {
+        book.goodreads_id: _source_metadata(book, source_metadata_map.get(book.goodreads_id, {}))
+        for book in books
+    }
+    del source_metadata_map
+    progress = tqdm(total=len(books), desc="Total Progress") if tqdm else None
+    # Book-level concurrency; request-level limits live on the shared pipeline.
+    admission = AdmissionController(args.workers)
+    _install_resize_signals(admission)
+
+    async def process(book: CalibreBook) -> None:
+        async with admission:
+            try:
+                await pipeline.run_file(
+                    input_text_path=book.txt_path,
+                    output_dir=output_base,
+                    source_metadata=source_metas[book.goodreads_id],
+                    book_id=book.goodreads_id
+                )
+            except Exception as e:
+                logger.error(f"Failed to process {book.title}: {e}", exc_info=True)
+        if progress:
+            progress.update(1)
+
+    try:
+        await asyncio.gather(*(process(book) for book in books))
+    finally:
+        if progress:
+            progress.close()
+        await pipeline.aclose()
 
 def main():
     args = parse_args()
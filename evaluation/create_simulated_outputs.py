@@ -1,13 +1,15 @@
 
-import json
 import sys
 import subprocess
+from collections import defaultdict
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 # Add repo root to path
 repo_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(repo_root))
 
+from lib.json_utils import loads as json_loads, write_json
 from preprocess_citations import preprocess
 
 def main():
@@ -100,7 +102,7 @@ def main():
     }
 
     raw_path = raw_dir / f"{book_id}.json"
-    raw_path.write_text(json.dumps(raw_payload, indent=2))
+    write_json(raw_path, raw_payload)
     print(f"Created Raw: {raw_path}")
 
     # 2. Run Preprocessing (Real)
@@ -108,7 +110,7 @@ def main():
     # but could run via subprocess.
     pre_payload = preprocess(raw_path, source_title="E Unibus Pluram", source_authors=["David Foster Wallace"])
     pre_path = pre_dir / f"{book_id}.json"
-    pre_path.write_text(json.dumps(pre_payload, indent=2, ensure_ascii=False))
+    write_json(pre_path, pre_payload)
     print(f"Created Preprocessed: {pre_path}")
 
     # 3. Process Workflow (Simulated using Generate Ground Truth Results)
@@ -118,7 +120,7 @@ def main():
         print("Error: ground_truth.json not found. Run generate_ground_truth.py first.")
         return
 
-    gt_data = json.loads(gt_path.read_text())
+    gt_data = json_loads(gt_path.read_bytes())
     
     # Map (Title, Author) -> Metadata
     lookup_map = {}
@@ -136,6 +138,16 @@ def main():
             if c["title"]:
                 lookup_map[(c["title"].lower(), c["author"].lower())] = m
     
+    # Invert lookup_map by lowercased author so the loose lookup below only
+    # scans the titles of matching authors, not every ground-truth entry.
+    by_author: Dict[str, List[Tuple[int, str, Optional[str], dict]]] = defaultdict(list)
+    for pos, ((gt_title, gt_author), meta) in enumerate(lookup_map.items()):
+        if not meta:
+            continue
+        by_author[gt_author.lower() if gt_author else ""].append(
+            (pos, gt_title.lower() if gt_title else "", gt_title, meta)
+        )
+
     final_output = {
         "source": {
             "title": "E Unibus Pluram",
@@ -159,35 +171,37 @@ def main():
         if key in lookup_map:
             match_meta = lookup_map[key]
         
-        # 2. Loose Lookup if no exact match
+        # 2. Loose Lookup if no exact match: only the titles of GT authors
+        # contained in the citation's author are substring-scanned; the
+        # lowest position wins, as in a scan of lookup_map in order.
         if not match_meta:
-             for (gt_title, gt_author), meta in lookup_map.items():
-                if not meta: continue
-                
-                # Check Author
-                author_match = False
-                if author and gt_author and gt_author.lower() in author.lower():
-                    author_match = True
-                elif not author and not gt_author:
-                    author_match = True # Both None? Unlikely
-                
-                if not author_match:
-                    continue
-
-                # Check Title
-                title_match = False
-                if title and gt_title and gt_title.lower() in title.lower():
-                    title_match = True
-                elif not title and not gt_title:
-                    title_match = True
-                
-                # Special case: "Burning" -> "The Public Burning"
-                if title == "Burning" and gt_title == "The Public Burning":
-                    title_match = True
-                
-                if author_match and title_match:
-                    match_meta = meta
-                    break
+            author_lower = author.lower() if author else ""
+            title_lower = title.lower() if title else ""
+            if author:
+                groups = [
+                    entries for gt_author_lower, entries in by_author.items()
+                    if gt_author_lower and gt_author_lower in author_lower
+                ]
+            else:
+                groups = [by_author.get("", [])]
+
+            best = None
+            for entries in groups:
+                for pos, gt_title_lower, gt_title, meta in entries:
+                    if best is not None and pos >= best[0]:
+                        break
+                    if title and gt_title:
+                        title_match = gt_title_lower in title_lower
+                    else:
+                        title_match = not title and not gt_title
+                    # Special case: "Burning" -> "The Public Burning"
+                    if title == "Burning" and gt_title == "The Public Burning":
+                        title_match = True
+                    if title_match:
+                        best = (pos, meta)
+                        break
+            if best is not None:
+                match_meta = best[1]
         
         # 3. Fallback: Check for Author-only match in GT if we failed book match
         # (e.g. if we have citation for "Life after Television" (Book) but GT says match_type="author" for that citation)
@@ -226,7 +240,7 @@ def main():
              })
 
     final_path = final_dir / f"{book_id}.json"
-    final_path.write_text(json.dumps(final_output, indent=2, ensure_ascii=False))
+    write_json(final_path, final_output)
     print(f"Created Final: {final_path}")
 
 if __name__ == "__main__":
@@ -1,8 +1,15 @@
-
 import sqlite3
 import sys
 from pathlib import Path
 
+# title and book_id are columns of books_fts, so the JSON blob is never decoded.
+SEARCH_SQL = "SELECT title, book_id FROM books_fts WHERE books_fts MATCH ? ORDER BY rank LIMIT 50"
+
+
+def _fts_escape(text: str) -> str:
+    return text.replace('"', '""')
+
+
 def main():
     db_path = Path("datasets/books_index.db")
     if not db_path.exists():
@@ -11,7 +18,7 @@ def main():
 
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
-    
+
     queries = [
         ("George Gilder", ""), # Empty string to match all
     ]
@@ -19,19 +26,19 @@ def main():
     print("--- Loose Search ---")
     for author, title_frag in queries:
         print(f"\nAuthor: {author}, Title Frag: '{title_frag}'")
-        fts_query = f'authors : "{author}"'
-        sql = "SELECT data FROM books_fts WHERE books_fts MATCH ? LIMIT 50"
-        
-        rows = conn.execute(sql, (fts_query,)).fetchall()
+        fts_query = f'authors : "{_fts_escape(author)}"'
+        if title_frag:
+            # Let FTS prune by title (prefix match on the last token) before
+            # any row reaches Python.
+            fts_query += f' AND title : "{_fts_escape(title_frag)}"*'
+
+        rows = conn.execute(SEARCH_SQL, (fts_query,)).fetchall()
         print(f"Found {len(rows)} books by {author}:")
         for row in rows:
-            import json
-            data = json.loads(row['data'])
-            t = data.get('title', '')
-            if title_frag and title_frag.lower() in t.lower():
-                print(f"  MATCH: {t} (ID: {data['book_id']})")
-            elif not title_frag:
-                 print(f"  - {t}")
+            if title_frag:
+                print(f"  MATCH: {row['title']} (ID: {row['book_id']})")
+            else:
+                 print(f"  - {row['title']}")
 
 if __name__ == "__main__":
     main()
@@ -1,23 +1,76 @@
 
 import asyncio
-import json
+import random
 import sys
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
 # Add repo root to path
 repo_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(repo_root))
 
+# Load .env once at import; variables already set in the environment win.
+try:
+    from dotenv import load_dotenv
+    load_dotenv(repo_root / ".env")
+except ImportError:
+    pass
+
+import httpx
+import openai
+
 from lib.bibliography_agent.citation_workflow import CitationWorkflow
 from lib.bibliography_agent.llm_utils import build_llm
 from llama_index.core import Settings
 import logging
+from lib.agent_cache import AgentResponseCache, prompt_key
+from lib.json_utils import dumps, loads as json_loads
 from lib.logging_config import setup_logging
+from lib.main_pipeline import HTTP2_AVAILABLE
 
 logger = logging.getLogger(__name__)
 
+# Ground-truth entries evaluated at once (workflow + enrichment LLM calls).
+EVAL_CONCURRENCY = int(os.environ.get("EVAL_CONCURRENCY", "16"))
+# Extra attempts for a workflow run that hit a transient error (see is_transient).
+WORKFLOW_RETRIES = 2
+RETRY_MAX_DELAY = 20.0
+
+# EVAL_USE_CACHE=1 replays enrichment answers from earlier runs instead of
+# paying for the LLM again; unset, every run still forces fresh lookups.
+EVAL_USE_CACHE = os.environ.get("EVAL_USE_CACHE") == "1"
+ENRICH_CACHE_PATH = repo_root / "datasets/eval_enrichment_cache.db"
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for errors worth retrying: dropped connections, rate limits, 5xx, timeouts."""
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code >= 500 or isinstance(exc, openai.RateLimitError)
+    return isinstance(exc, (httpx.TransportError, openai.APIConnectionError, TimeoutError))
+
+
+def citation_key(cit: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """(title, author) with case and surrounding whitespace folded, so both GT files agree on keys."""
+    title, author = cit.get("title"), cit.get("author")
+    return (
+        title.strip().casefold() if title else title,
+        author.strip().casefold() if author else author,
+    )
+
+
+async def cached_call(cache: Optional[AgentResponseCache], model: str, fn, *args: Any) -> Any:
+    """Await fn(*args), memoized in `cache` by (model, function, args) when a cache is given."""
+    if cache is None:
+        return await fn(*args)
+    key = prompt_key(dumps([fn.__qualname__, list(args)]).decode("utf-8"), model)
+    hit = cache.get(key)
+    if hit is not None:
+        return json_loads(hit)
+    value = await fn(*args)
+    cache.put(key, dumps(value).decode("utf-8"))
+    return value
+
 # Metrics tracking
 class Metrics:
     def __init__(self):
@@ -39,7 +92,8 @@ class Metrics:
 
 def fuzzy_match(s1: str, s2: str) -> bool:
     if not s1 or not s2: return False
-    return s1.lower() in s2.lower() or s2.lower() in s1.lower()
+    a, b = s1.lower(), s2.lower()
+    return a in b or b in a
 
 async def run_evaluation():
     log_file = setup_logging(Path("evaluation/logs"))
@@ -66,32 +120,31 @@ async def run_evaluation():
         logger.error("Error: Ground truth files not found.")
         return
         
-    gt_entries = json.loads(gt_path.read_text())
-    enrich_entries = json.loads(enrich_gt_path.read_text())
+    gt_entries = json_loads(gt_path.read_bytes())
     
-    # Build a lookup for enrichment GT by (title, author)
+    # Build a lookup for enrichment GT by normalized (title, author); the parsed list is
+    # dropped as soon as the index is built.
     enrich_lookup = {}
-    for entry in enrich_entries:
+    for entry in json_loads(enrich_gt_path.read_bytes()):
         c = entry["citation"]
-        key = (c.get("title"), c.get("author"))
-        enrich_lookup[key] = entry.get("enrichment")
+        enrich_lookup[citation_key(c)] = entry.get("enrichment")
 
     # Initialize Workflow
     api_key = os.environ.get("OPENROUTER_API_KEY", "")
     base_url = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
     model = "openai/gpt-oss-120b"
     
-    if not api_key:
-        env_path = repo_root / ".env"
-        if env_path.exists():
-            logger.info(f"Loading .env from {env_path}")
-            with open(env_path) as f:
-                for line in f:
-                    if line.strip() and not line.startswith("#") and "=" in line:
-                        k, v = line.strip().split("=", 1)
-                        if k == "OPENROUTER_API_KEY":
-                            api_key = v
-                            
+    # One keep-alive pool (HTTP/2 when h2 is installed) for every concurrent
+    # workflow/enrichment call, sized to EVAL_CONCURRENCY; closed at the end.
+    http_client = httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_keepalive_connections=EVAL_CONCURRENCY,
+            max_connections=EVAL_CONCURRENCY * 2,
+        ),
+        timeout=httpx.Timeout(150.0),
+    )
+
     from llama_index.llms.openai_like import OpenAILike
     llm = OpenAILike(
         model=model,
@@ -100,7 +153,8 @@ async def run_evaluation():
         is_chat_model=True,
         is_function_calling_model=False,
         context_window=131072,
-        max_tokens=1024
+        max_tokens=1024,
+        async_http_client=http_client,
     )
     
     workflow = CitationWorkflow(
@@ -119,103 +173,139 @@ async def run_evaluation():
         llm=llm
     )
     
+    enrich_cache = AgentResponseCache(ENRICH_CACHE_PATH) if EVAL_USE_CACHE else None
+    if enrich_cache is not None:
+        logger.info(f"Replaying cached enrichment answers from {ENRICH_CACHE_PATH}")
+
     metrics = Metrics()
     metrics.total = len(gt_entries)
     
     logger.info(f"Processing {len(gt_entries)} citations from Ground Truth...")
     
-    for i, entry in enumerate(gt_entries):
-        cit = entry["citation"]
-        logger.info(f"[{i+1}/{len(gt_entries)}] Processing: {cit.get('title', 'Unknown')} / {cit.get('author', 'Unknown')}")
+    # Entries are independent LLM round trips, so they run concurrently,
+    # bounded by EVAL_CONCURRENCY; log lines carry the entry tag.
+    sem = asyncio.Semaphore(EVAL_CONCURRENCY)
+
+    async def process_entry(i: int, entry: Dict[str, Any]) -> None:
+        async with sem:
+            cit = entry["citation"]
+            tag = f"[{i+1}/{len(gt_entries)}]"
+            logger.info(f"{tag} Processing: {cit.get('title', 'Unknown')} / {cit.get('author', 'Unknown')}")
         
-        # 1. Run Workflow
-        try:
-            result = await workflow.run(citation=cit)
-        except Exception as e:
-            logger.error(f"  Error running workflow: {e}")
-            continue
-
-        metrics.processed += 1
+            # 1. Run Workflow (transient API errors are retried with jittered backoff)
+            result = None
+            for attempt in range(WORKFLOW_RETRIES + 1):
+                try:
+                    result = await workflow.run(citation=cit)
+                    break
+                except Exception as e:
+                    if attempt == WORKFLOW_RETRIES or not is_transient(e):
+                        logger.error(f"{tag}  Error running workflow: {e}")
+                        return
+                    delay = min(RETRY_MAX_DELAY, 2 ** attempt) * random.uniform(0.5, 1.0)
+                    logger.warning(f"{tag}  Workflow error (attempt {attempt + 1}/{WORKFLOW_RETRIES + 1}), retrying in {delay:.1f}s: {e}")
+                    await asyncio.sleep(delay)
+
+            metrics.processed += 1
         
-        match_type = result.get("match_type")
-        metadata = result.get("metadata", {})
+            match_type = result.get("match_type")
+            metadata = result.get("metadata", {})
         
-        logger.info(f"  Match: {match_type}")
-        if match_type in ["book", "author", "person"]:
-             metrics.goodreads_hits += 1
+            logger.info(f"{tag}  Match: {match_type}")
+            if match_type in ["book", "author", "person"]:
+                 metrics.goodreads_hits += 1
         
-        # 2. Enrichment
-        enriched_author_meta = {}
-        book_year = None
+            # 2. Enrichment
+            enriched_author_meta = {}
+            book_year = None
         
-        # Identity to enrich
-        author_name_to_enrich = None
+            # Identity to enrich
+            author_name_to_enrich = None
+            book_task = None
         
-        if match_type == "book":
-            book_id = metadata.get("book_id")
-            title = metadata.get("title")
-            # Author name from metadata or citation
-            author_data = metadata.get("author") # string or list?
-            # Usually author is inside metadata if it came from GR
-            # But duplicate author logic might be tricky.
-            # GR metadata usually has 'authors': ['Name'] or similar?
-            # Workflow metadata update:
-            # if gr_res: metadata.update(gr_res).
-            # gr_res usually has 'title', 'book_id', 'author' (string name if single)
+            if match_type == "book":
+                book_id = metadata.get("book_id")
+                title = metadata.get("title")
+                # Author name from metadata or citation
+                author_data = metadata.get("author") # string or list?
+                # Usually author is inside metadata if it came from GR
+                # But duplicate author logic might be tricky.
+                # GR metadata usually has 'authors': ['Name'] or similar?
+                # Workflow metadata update:
+                # if gr_res: metadata.update(gr_res).
+                # gr_res usually has 'title', 'book_id', 'author' (string name if single)
             
-            author_clean = metadata.get("author") 
-            if not author_clean: author_clean = cit.get("author")
+                author_clean = metadata.get("author") 
+                if not author_clean: author_clean = cit.get("author")
             
-            # Enrich Book Year
-            try:
-                book_year = await enricher.enrich_book(str(book_id) if book_id else None, title, author_clean)
-            except Exception as e:
-                logger.error(f"  Enrich Book Error: {e}")
-
-            if author_clean:
-                author_name_to_enrich = author_clean
+                # Enrich Book Year (awaited together with the author below)
+                book_task = cached_call(
+                    enrich_cache, model, enricher.enrich_book, str(book_id) if book_id else None, title, author_clean
+                )
+
+                if author_clean:
+                    author_name_to_enrich = author_clean
                 
-        elif match_type in ["author", "person"]:
-            author_name_to_enrich = metadata.get("name") or cit.get("author")
-
-        # Enrich Author
-        if author_name_to_enrich:
-            try:
-                enriched_author_meta = await enricher.enrich_author(author_name_to_enrich)
-            except Exception as e:
-                logger.error(f"  Enrich Author Error: {e}")
+            elif match_type in ["author", "person"]:
+                author_name_to_enrich = metadata.get("name") or cit.get("author")
+
+            # Enrich Author, overlapping the independent book-year lookup
+            author_task = (
+                cached_call(enrich_cache, model, enricher.enrich_author, author_name_to_enrich)
+                if author_name_to_enrich else None
+            )
+            tasks = [t for t in (book_task, author_task) if t is not None]
+            results = iter(await asyncio.gather(*tasks, return_exceptions=True))
+            if book_task is not None:
+                book_result = next(results)
+                if isinstance(book_result, Exception):
+                    logger.error(f"{tag}  Enrich Book Error: {book_result}")
+                else:
+                    book_year = book_result
+            if author_task is not None:
+                author_result = next(results)
+                if isinstance(author_result, Exception):
+                    logger.error(f"{tag}  Enrich Author Error: {author_result}")
+                else:
+                    enriched_author_meta = author_result
         
-        # 3. Validation
-        key = (cit.get("title"), cit.get("author"))
-        expected = enrich_lookup.get(key)
+            # 3. Validation
+            expected = enrich_lookup.get(citation_key(cit))
         
-        if expected:
-            # Check correctness (Birth/Death Year)
-            # Expected format: {"birth_year": 1930, "death_year": 2024, ...}
+            if expected:
+                # Check correctness (Birth/Death Year)
+                # Expected format: {"birth_year": 1930, "death_year": 2024, ...}
             
-            if enriched_author_meta:
-                # Compare fuzzy
-                logger.info(f"  Enriched Author: {author_name_to_enrich} -> {enriched_author_meta}")
+                if enriched_author_meta:
+                    # Compare fuzzy
+                    logger.info(f"{tag}  Enriched Author: {author_name_to_enrich} -> {enriched_author_meta}")
                 
-                # Check birth year
-                exp_born = expected.get("birth_year")
-                got_born = enriched_author_meta.get("birth_year")
+                    # Check birth year
+                    exp_born = expected.get("birth_year")
+                    got_born = enriched_author_meta.get("birth_year")
                 
-                if exp_born and got_born:
-                    if exp_born == got_born:
-                        logger.info(f"    ✅ Birth Year Matches: {got_born}")
-                    else:
-                        logger.warning(f"    ❌ Birth Year Mismatch: Exp {exp_born} vs Got {got_born}")
+                    if exp_born and got_born:
+                        if exp_born == got_born:
+                            logger.info(f"{tag}    ✅ Birth Year Matches: {got_born}")
+                        else:
+                            logger.warning(f"{tag}    ❌ Birth Year Mismatch: Exp {exp_born} vs Got {got_born}")
                 
-                metrics.enrichment_hits += 1
+                    metrics.enrichment_hits += 1
+                else:
+                    logger.warning(f"{tag}  MISSING ENRICHMENT! Expected for {author_name_to_enrich}")
+                    metrics.enrichment_missed += 1
             else:
-                logger.warning(f"  MISSING ENRICHMENT! Expected for {author_name_to_enrich}")
-                metrics.enrichment_missed += 1
-        else:
-            if enriched_author_meta:
-                 logger.info(f"  (Unexpected Enrichment found for {author_name_to_enrich}: {enriched_author_meta})")
-            if book_year:
-                 logger.info(f"  (Book Year Found: {book_year})")
+                if enriched_author_meta:
+                     logger.info(f"{tag}  (Unexpected Enrichment found for {author_name_to_enrich}: {enriched_author_meta})")
+                if book_year:
+                     logger.info(f"{tag}  (Book Year Found: {book_year})")
+
+    try:
+        await asyncio.gather(*(process_entry(i, entry) for i, entry in enumerate(gt_entries)))
+    finally:
+        if enrich_cache is not None:
+            enrich_cache.close()
+        await http_client.aclose()
 
     metrics.report()
 
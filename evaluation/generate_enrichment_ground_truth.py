@@ -1,6 +1,5 @@
 
 import sys
-import json
 from pathlib import Path
 
 # Add repo root to path
@@ -8,6 +7,7 @@ repo_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(repo_root))
 
 from lib.bibliography_agent.bibliography_tool import SQLiteWikiPeopleIndex
+from lib.json_utils import loads as json_loads, write_json
 
 def main():
     wiki_db_path = repo_root / "datasets/wiki_people_index.db"
@@ -25,11 +25,18 @@ def main():
         print("Error: ground_truth.json not found.")
         return
         
-    gt_data = json.loads(gt_path.read_text())
+    gt_data = json_loads(gt_path.read_bytes())
     
     enrichment_results = []
     
     print("Generating Enrichment Ground Truth...")
+
+    # Many citations share an author, so the index is searched once per
+    # distinct name up front and the loop below only does dict lookups.
+    author_names = dict.fromkeys(
+        entry["citation"].get("author") for entry in gt_data if entry["citation"].get("author")
+    )
+    matches_by_name = {name: wiki.find_people(name, limit=1) for name in author_names}
     
     for entry in gt_data:
         citation = entry["citation"]
@@ -62,7 +69,7 @@ def main():
 
         # Search Wiki
         # We try strict search first or just use the tool's fuzzy search
-        matches = wiki.find_people(author_name, limit=1)
+        matches = matches_by_name[author_name]
         
         enrichment_data = None
         if matches:
@@ -84,7 +91,7 @@ def main():
         })
 
     output_path = repo_root / "evaluation/enrichment_ground_truth.json"
-    output_path.write_text(json.dumps(enrichment_results, indent=2))
+    write_json(output_path, enrichment_results)
     print(f"\nWrote {len(enrichment_results)} enrichment entries to {output_path}")
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 
 import sys
-import json
+import tomllib
+from functools import lru_cache
 from pathlib import Path
 
 # Add repo root to path to import lib
@@ -8,71 +9,48 @@ repo_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(repo_root))
 
 from lib.bibliography_agent.bibliography_tool import SQLiteGoodreadsCatalog, GoodreadsAuthorCatalog
+from lib.json_utils import loads as json_loads, write_json
+
+TARGETS_PATH = Path(__file__).parent / "ground_truth_targets.toml"
 
 def main():
     books_db = SQLiteGoodreadsCatalog(db_path="datasets/books_index.db", trace=True)
     # authors_db = GoodreadsAuthorCatalog("datasets/goodreads_book_authors.json") 
     
-    # List of (Title, Author) tuples to search for.
-    # If Author is None, will search title only (risky for common titles).
-    # If Title is None, will search Author only.
-    target_citations = [
-        ("The End of the Road", "John Barth"),
-        ("The Sot-Weed Factor", "John Barth"),
-        ("The Recognitions", "William Gaddis"),
-        ("The Crying of Lot 49", "Thomas Pynchon"),
-        ("The Whole Truth", "James Cummin"),
-        ("The Public Burning", "Robert Coover"), # Text says "A Public Burning"
-        ("A Political Fable", "Robert Coover"),
-        ("The Propheteers", "Max Apple"),
-        ("And Other Travels", "Bill Knott"),
-        ("Arrested Saturday Night", "Stephen Dobyns"),
-        ("Crash Course", "Bill Knott"), # Poem? might be in a book
-        ("White Noise", "Don DeLillo"),
-        ("Great Jones Street", "Don DeLillo"),
-        ("The Oranging of America", "Max Apple"),
-        ("Krazy Kat", "Jay Cantor"),
-        ("You Bright and Risen Angels", "William T. Vollmann"),
-        ("Movies", "Stephen Dixon"), # "Movies: Seventeen Stories"
-        ("Libra", "Don DeLillo"),
-        ("The Safety of Objects", "A. M. Homes"),
-        ("The Rainbow Stories", "William T. Vollmann"),
-        ("Fort Wayne Is Seventh on Hitler's List", "Michael Martone"),
-        ("My Cousin, My Gastroenterologist", "Mark Leyner"),
-        ("The Dharma Bums", "Jack Kerouac"),
-        ("Candide", "Voltaire"),
-        ("Bright Lights, Big City", "Jay McInerney"), # Referred to as "Bright Lights"
-        ("A Night at the Movies", "Robert Coover"),
-        ("You Must Remember This", "Robert Coover"),
-        ("Life after Television", "George Gilder"),
-    ]
+    # The (Title, Author) pairs searched as books and the author-only names
+    # live in ground_truth_targets.toml.
+    targets = tomllib.loads(TARGETS_PATH.read_text(encoding="utf-8"))
+    target_citations = [tuple(pair) for pair in targets["citations"]]
+    target_authors = targets["authors"]
 
-    # Additional Authors mentioned by last name or full name in text
-    target_authors = [
-        "Norman Mailer",
-        "Jay McInerney",
-        "Tama Janowitz",
-        "Louise Erdrich",
-        "Ralph Waldo Emerson",
-        "Octavio Paz",
-        "James Joyce",
-        "Vladimir Nabokov",
-        "Honore de Balzac",
-        "Samuel Huntington",
-        "Barbara Tuchman",
-        "Alexis de Tocqueville", # de Tocqueville
-        "Stanley Cavell",
-        "Lewis Hyde",
-        "Janet Maslin", # Critic, maybe has books indexed?
-        "David Leavitt",
-    ]
+    # Entries resolved by a previous run are reused as-is, so a rerun after
+    # editing the targets only searches new or still-unmatched citations.
+    # Delete ground_truth.json to search everything again.
+    output_path = Path(__file__).parent / "ground_truth.json"
+    previous = {}
+    if output_path.exists():
+        for entry in json_loads(output_path.read_bytes()):
+            if entry.get("expected_match"):
+                c = entry["citation"]
+                previous[(c.get("title"), c.get("author"))] = entry
+        print(f"Reusing up to {len(previous)} resolved entries from {output_path}")
 
     results = []
 
     print("Searching for Books...")
     authors_db = GoodreadsAuthorCatalog("datasets/goodreads_book_authors.json") 
+
+    # Several authors appear in both lists (and more than once in the book
+    # list), so each distinct name is resolved against the catalog only once.
+    @lru_cache(maxsize=None)
+    def find_author(name):
+        matches = authors_db.find_authors(query=name, limit=1)
+        return matches[0] if matches else None
     
     for title, author in target_citations:
+        if (title, author) in previous:
+            results.append(previous[(title, author)])
+            continue
         print(f"Searching: {title} by {author}")
         matches = books_db.find_books(title=title, author=author, limit=1)
         if matches:
@@ -96,9 +74,8 @@ def main():
             # Fallback to author lookup
             if author:
                 # Reuse authors_db which we will initialize earlier
-                auth_matches = authors_db.find_authors(query=author, limit=1)
-                if auth_matches:
-                    best_auth = auth_matches[0]
+                best_auth = find_author(author)
+                if best_auth:
                     print(f"    FOUND AUTHOR: {best_auth['name']} (ID: {best_auth['author_id']})")
                     results.append({
                         "citation": {
@@ -134,15 +111,15 @@ def main():
     # But since we are mocking the 'expected_match', let's just assume if we find them in book search (as author) 
     # or just create a placeholder if we assume they are valid.
     # However, to be accurate, let's use the Author Catalog if possible. 
-    # But the script commented out `authors_db`. Let's uncomment it.
-    
-    authors_db = GoodreadsAuthorCatalog("datasets/goodreads_book_authors.json") 
+    # The catalog loaded for the book fallback above (and its lookup memo) is reused.
     
     for author_name in target_authors:
+        if (None, author_name) in previous:
+            results.append(previous[(None, author_name)])
+            continue
         print(f"Searching Author: {author_name}")
-        matches = authors_db.find_authors(query=author_name, limit=1)
-        if matches:
-            best = matches[0]
+        best = find_author(author_name)
+        if best:
             print(f"  FOUND: {best['name']} (ID: {best['author_id']})")
             results.append({
                 "citation": {
@@ -167,8 +144,7 @@ def main():
                 "expected_match": None
             })
 
-    output_path = Path(__file__).parent / "ground_truth.json"
-    output_path.write_text(json.dumps(results, indent=2))
+    write_json(output_path, results)
     print(f"\nWrote {len(results)} entries to {output_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveSemaphore:
+    """Concurrency limit that tunes itself from observed throughput (AIMD).
+
+    Drop-in for `asyncio.Semaphore` as an async context manager. Every
+    `window` completions the completion rate is compared with the previous
+    window: a clear gain adds one permit, a clear loss (the server queueing
+    instead of batching) cuts the limit by a quarter, anything in between
+    holds. The limit always stays within [minimum, maximum].
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        *,
+        maximum: int,
+        minimum: int = 1,
+        window: int = 20,
+        name: str = "adaptive",
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.window = max(1, window)
+        self.name = name
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._completed = 0
+        self._window_start = time.monotonic()
+        self._last_rate: Optional[float] = None
+
+    async def acquire(self) -> None:
+        while self._in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # Woken but cancelled before running: pass the wake-up on.
+                    self._wake()
+                raise
+        self._in_flight += 1
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._record_completion()
+        self._wake()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+    def _wake(self) -> None:
+        free = self.limit - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _record_completion(self) -> None:
+        self._completed += 1
+        if self._completed < self.window:
+            return
+        now = time.monotonic()
+        rate = self._completed / max(now - self._window_start, 1e-9)
+        previous = self.limit
+        if self._last_rate is not None:
+            if rate > self._last_rate * 1.05:
+                self.limit = min(self.limit + 1, self.maximum)
+            elif rate < self._last_rate * 0.9:
+                self.limit = max(int(self.limit * 0.75), self.minimum)
+        else:
+            self.limit = min(self.limit + 1, self.maximum)
+        if self.limit != previous:
+            logger.info(f"[{self.name}] {rate:.2f} completions/s -> limit {previous} -> {self.limit}")
+        self._last_rate = rate
+        self._completed = 0
+        self._window_start = now
@@ -0,0 +1,44 @@
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Optional, Union
+
+DEFAULT_CACHE_PATH = Path("datasets/agent_response_cache.db")
+
+
+def prompt_key(prompt: str, model: str = "") -> bytes:
+    """16-byte digest identifying a prompt for `model`; identical citations share a key."""
+    return hashlib.blake2b(f"{model}\0{prompt}".encode("utf-8"), digest_size=16).digest()
+
+
+class AgentResponseCache:
+    """Persistent prompt -> response memo for the Goodreads agent stage.
+
+    Recurring citations ("Plato, Republic") build byte-identical prompts, so
+    only the first occurrence across the whole library reaches the LLM.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode = WAL;")
+        self.conn.execute("PRAGMA synchronous = NORMAL;")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, response BLOB NOT NULL) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get(self, key: bytes) -> Optional[str]:
+        row = self.conn.execute("SELECT response FROM cache WHERE key = ?", (key,)).fetchone()
+        return row[0].decode("utf-8") if row else None
+
+    def put(self, key: bytes, response: str) -> None:
+        self.conn.execute(
+            "INSERT OR IGNORE INTO cache (key, response) VALUES (?, ?)",
+            (key, response.encode("utf-8")),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
@@ -9,10 +9,13 @@ from __future__ import annotations
 import json
 import re
 import sqlite3
+import threading
 import time
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
 
+from lib.json_utils import loads as json_loads
+
 if TYPE_CHECKING:  # pragma: no cover
     from llama_index.core.tools import FunctionTool
 
@@ -38,6 +41,33 @@ BOOK_METADATA_KEYS = {
     "text_reviews_count",
 }
 MAX_DESCRIPTION_CHARS = 512
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# The FTS indexes are only ever read here: open them read-only with a large
+# page cache and memory-mapped I/O.
+_READ_PRAGMAS = """
+PRAGMA query_only = ON;
+PRAGMA mmap_size = 1073741824;
+PRAGMA cache_size = -65536;
+PRAGMA temp_store = MEMORY;
+"""
+
+
+class _ReadOnlyConnections:
+    """One read-only connection per thread, so lookups can run in worker threads concurrently."""
+
+    def __init__(self, db_path: Path) -> None:
+        self._uri = f"{db_path.resolve().as_uri()}?mode=ro"
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True)
+            conn.row_factory = sqlite3.Row
+            conn.executescript(_READ_PRAGMAS)
+            self._local.conn = conn
+        return conn
 
 
 def _to_int(value: Any) -> Optional[int]:
@@ -55,7 +85,7 @@ def _to_float(value: Any) -> Optional[float]:
 
 
 def _normalize(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip().casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
 
 
 def _format_match_data(book: Dict[str, Any]) -> Dict[str, Any]:
@@ -107,11 +137,15 @@ class SQLiteGoodreadsCatalog:
             raise FileNotFoundError(
                 f"{self.db_path} not found. Run scripts/build_goodreads_index.py first."
             )
-        self._conn = sqlite3.connect(self.db_path)
-        self._conn.row_factory = sqlite3.Row
+        self._connections = _ReadOnlyConnections(self.db_path)
+        self._connections.get()
         if trace:
             print(f"[goodreads_tool] Connected to {self.db_path}")
 
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
     def _fts_escape(self, text: str) -> str:
         return text.replace('"', '""')
 
@@ -213,13 +247,14 @@ class GoodreadsAuthorCatalog:
                 f"Author dataset missing at {self.authors_path.resolve()}."
             )
 
-        # Load and cache the data at class level
+        # Load and cache the data at class level. Lines are parsed as bytes
+        # (orjson when installed), skipping the str decode of the whole file.
         authors_list: List[Dict[str, Any]] = []
-        with self.authors_path.open("r", encoding="utf-8") as fh:
+        with self.authors_path.open("rb") as fh:
             for line in fh:
                 try:
-                    row = json.loads(line)
-                except json.JSONDecodeError:
+                    row = json_loads(line)
+                except ValueError:
                     continue
                 authors_list.append(row)
 
@@ -267,8 +302,8 @@ class SQLiteWikiPeopleIndex:
                 f"{self.db_path} not found. Build it via scripts/filter_wiki_people.py "
                 "then scripts/build_wiki_people_index.py."
             )
-        self._conn = sqlite3.connect(self.db_path)
-        self._conn.row_factory = sqlite3.Row
+        self._connections = _ReadOnlyConnections(self.db_path)
+        self._connections.get()
         
         # Load overrides
         self.overrides = {}
@@ -288,6 +323,10 @@ class SQLiteWikiPeopleIndex:
         if trace:
             print(f"[wiki_people_tool] Connected to {self.db_path}")
 
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
     def _fts_escape(self, text: str) -> str:
         return text.replace('"', '""')
 
@@ -30,6 +30,9 @@ logger = logging.getLogger(__name__)
 
 # --- Helpers ---
 
+_WORD_RE = re.compile(r'\w+')
+
+
 def fuzzy_token_sort_ratio(s1: str, s2: str) -> int:
     """
     Mimics fuzzywuzzy.token_sort_ratio using difflib.
@@ -41,8 +44,8 @@ def fuzzy_token_sort_ratio(s1: str, s2: str) -> int:
     if not s1 or not s2:
         return 0
 
-    tokens1 = sorted(re.findall(r'\w+', s1.lower()))
-    tokens2 = sorted(re.findall(r'\w+', s2.lower()))
+    tokens1 = sorted(_WORD_RE.findall(s1.lower()))
+    tokens2 = sorted(_WORD_RE.findall(s2.lower()))
 
     sorted_s1 = " ".join(tokens1)
     sorted_s2 = " ".join(tokens2)
@@ -260,7 +263,11 @@ class CitationWorkflow(Workflow):
         for q in queries:
             if mode == "book":
                 # Search books with title and author
-                matches = self.book_catalog.find_books(title=q.title, author=q.author, limit=5)
+                # SQLite FTS lookups run off the event loop (one read-only
+                # connection per worker thread), so concurrent citations overlap.
+                matches = await asyncio.to_thread(
+                    self.book_catalog.find_books, title=q.title, author=q.author, limit=5
+                )
             else:
                 # Search authors
                 # Use author field if present, else title (fallback)
@@ -329,7 +336,7 @@ class CitationWorkflow(Workflow):
             if not name:
                 continue
 
-            matches = self.wiki_catalog.find_people(name=name, limit=5)
+            matches = await asyncio.to_thread(self.wiki_catalog.find_people, name=name, limit=5)
             for m in matches:
                 mid = m.get("page_id")
                 if mid and mid not in seen_ids:
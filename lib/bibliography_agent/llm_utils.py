@@ -1,16 +1,26 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from llama_index.core.llms import LLM
 from llama_index.llms.openai import OpenAI
 
-def build_llm(model: str, api_key: str, base_url: Optional[str]) -> LLM:
+if TYPE_CHECKING:  # pragma: no cover
+    import httpx
+
+
+def build_llm(
+    model: str,
+    api_key: str,
+    base_url: Optional[str],
+    async_http_client: Optional["httpx.AsyncClient"] = None,
+) -> LLM:
     """
     Create an OpenAI-compatible LLM wrapper for LlamaIndex.
 
     Prefers `OpenAILike` so we can target OpenRouter or any self-hosted endpoint.
     Falls back to the builtin OpenAI wrapper if base_url is omitted.
+    Pass `async_http_client` to control the connection pool the LLM uses.
     """
     if not base_url:
-        return OpenAI(model=model, api_key=api_key, timeout=150.0)
+        return OpenAI(model=model, api_key=api_key, timeout=150.0, async_http_client=async_http_client)
 
     try:
         from llama_index.llms.openai_like import OpenAILike
@@ -22,6 +32,13 @@ def build_llm(model: str, api_key: str, base_url: Optional[str]) -> LLM:
             is_chat_model=True,
             is_function_calling_model=True,
             timeout=150.0,
+            async_http_client=async_http_client,
         )
     except ModuleNotFoundError:
-        return OpenAI(model=model, api_key=api_key, base_url=base_url, timeout=150.0)
+        return OpenAI(
+            model=model,
+            api_key=api_key,
+            base_url=base_url,
+            timeout=150.0,
+            async_http_client=async_http_client,
+        )
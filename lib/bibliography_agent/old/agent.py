@@ -27,10 +27,9 @@ import argparse
 import asyncio
 import json
 import os
-import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional, Sequence, List, Dict
+from typing import TYPE_CHECKING, Optional, Sequence, List, Dict, Tuple
 
 from llama_index.core.agent import FunctionAgent
 from llama_index.llms.openai import OpenAI
@@ -38,8 +37,75 @@ from pydantic import BaseModel, Field
 from typing import Literal
 
 if TYPE_CHECKING:  # pragma: no cover
+    import httpx
     from llama_index.core.llms import ChatMessage, LLM
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _find_first_json_object(text: str, start: int = 0) -> Optional[Tuple[int, int]]:
+    """
+    Return the [begin, end) span of the first balanced {...} at or after `start`.
+
+    One linear pass tracking depth and string literals (with escapes), so braces
+    inside strings don't count and malformed output can't trigger regex
+    backtracking. None if no object closes.
+    """
+    begin = text.find("{", start)
+    if begin == -1:
+        return None
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(begin, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return begin, i + 1
+    return None
+
+
+def extract_json_snippet(text: str) -> Optional[str]:
+    """
+    Return the first parseable JSON object in `text`: the whole string, then the
+    first balanced {...} from a fenced ```json``` block onwards, then from the
+    start of the text. None if nothing parses.
+    """
+    try:
+        json_loads(text)
+        return text
+    except ValueError:
+        pass
+
+    fence = text.find("```json")
+    for start in ((fence, 0) if fence != -1 else (0,)):
+        # Resume after each object that fails to parse, so every pass stays linear.
+        while (span := _find_first_json_object(text, start)) is not None:
+            snippet = text[span[0]:span[1]]
+            try:
+                json_loads(snippet)
+                return snippet
+            except ValueError:
+                start = span[1]
+    return None
+
 CURRENT_DIR = Path(__file__).resolve().parent
 if str(CURRENT_DIR) not in os.sys.path:  # pragma: no cover
     os.sys.path.insert(0, str(CURRENT_DIR))
@@ -140,15 +206,21 @@ SYSTEM_PROMPT = (
 )
 
 
-def build_llm(model: str, api_key: str, base_url: Optional[str]) -> LLM:
+def build_llm(
+    model: str,
+    api_key: str,
+    base_url: Optional[str],
+    async_http_client: Optional["httpx.AsyncClient"] = None,
+) -> LLM:
     """
     Create an OpenAI-compatible LLM wrapper for LlamaIndex.
 
     Prefers `OpenAILike` so we can target OpenRouter or any self-hosted endpoint.
     Falls back to the builtin OpenAI wrapper if base_url is omitted.
+    Pass `async_http_client` to share one connection pool between several LLMs.
     """
     if not base_url:
-        return OpenAI(model=model, api_key=api_key, timeout=120.0)
+        return OpenAI(model=model, api_key=api_key, timeout=120.0, async_http_client=async_http_client)
 
     try:
         from llama_index.llms.openai_like import OpenAILike
@@ -160,9 +232,16 @@ def build_llm(model: str, api_key: str, base_url: Optional[str]) -> LLM:
             is_chat_model=True,
             is_function_calling_model=True,
             timeout=120.0,
+            async_http_client=async_http_client,
         )
     except ModuleNotFoundError:
-        return OpenAI(model=model, api_key=api_key, base_url=base_url, timeout=120.0)
+        return OpenAI(
+            model=model,
+            api_key=api_key,
+            base_url=base_url,
+            timeout=120.0,
+            async_http_client=async_http_client,
+        )
 
 
 @dataclass
@@ -179,7 +258,7 @@ class GoodreadsAgentRunner:
 
         - Pass through tool calls unchanged (run_agent_stage3 handles them).
         - Try direct JSON parse; if that fails, try fenced ```json``` blocks,
-          then a loose first {...} match.
+          then the first balanced {...} object.
         - Fall back to a structured error payload instead of raising.
         """
         cleaned = raw.strip()
@@ -187,31 +266,9 @@ class GoodreadsAgentRunner:
             return json.dumps({})
         if cleaned.startswith("<tool_call>"):
             return cleaned
-        try:
-            json.loads(cleaned)
-            return cleaned
-        except Exception:
-            pass
-
-        fence = re.search(
-            r"```json\s*(\{.*?\})\s*```", cleaned, flags=re.DOTALL)
-        if fence:
-            snippet = fence.group(1).strip()
-            try:
-                json.loads(snippet)
-                return snippet
-            except Exception:
-                pass
-
-        brace = re.search(r"(\{.*\})", cleaned, flags=re.DOTALL)
-        if brace:
-            snippet = brace.group(1)
-            try:
-                json.loads(snippet)
-                return snippet
-            except Exception:
-                pass
-
+        snippet = extract_json_snippet(cleaned)
+        if snippet is not None:
+            return snippet
         return json.dumps({"result": "UNPARSEABLE", "raw_response": cleaned}, ensure_ascii=False)
 
     async def _chat_async(
@@ -343,9 +400,10 @@ def build_agent(
     verbose: bool,
     trace_tool: bool = False,
     system_prompt: Optional[str] = None,
+    async_http_client: Optional["httpx.AsyncClient"] = None,
 ) -> GoodreadsAgentRunner:
     """Construct a function-calling agent with our Goodreads lookup tool."""
-    llm = build_llm(model=model, api_key=api_key, base_url=base_url)
+    llm = build_llm(model=model, api_key=api_key, base_url=base_url, async_http_client=async_http_client)
     memory_catalog = SQLiteGoodreadsCatalog(
         db_path=BOOKS_DB_PATH,
         trace=trace_tool,
@@ -111,28 +111,29 @@ def build_prompts(
     source_authors: List[str],
     source_description: Optional[str] = None,
 ) -> List[str]:
-    prompts = []
-    source_block = [
-        "These citations come from the following source book:",
-        f"  Title   : {source_title}",
-        f"  Authors : {', '.join(source_authors) if source_authors else '<unknown>'}",
-        f"  Summary : {source_description.strip() if source_description else '<no description provided>'}",
-        "Use this context to disambiguate titles/authors but still validate against Goodreads.",
-    ]
-    for citation in citations:
-        title = citation.get("title") or ""
-        author = citation.get("author") or ""
-        lines = [
+    # Everything but the title/author lines is identical for every citation of a
+    # book: join it once, and keep it as a shared prefix the server can cache.
+    header = "\n".join(
+        [
             "You are validating bibliography metadata for citations extracted from the source book below.",
-            *source_block,
+            "These citations come from the following source book:",
+            f"  Title   : {source_title}",
+            f"  Authors : {', '.join(source_authors) if source_authors else '<unknown>'}",
+            f"  Summary : {source_description.strip() if source_description else '<no description provided>'}",
+            "Use this context to disambiguate titles/authors but still validate against Goodreads.",
             "Use the Goodreads search tool to check whether the specified book exists.",
             "Return a JSON object describing the matching Goodreads metadata.",
             "You may call only one Goodreads search field at a time: either use the title-only path OR the author-only path, never both in a single call.",
             "If nothing is found, return an empty JSON object `{}`.",
-            f'Book title: "{title}"' if title else "Book title: <not provided>",
-            f"Author: {author}" if author else "Author: <not provided>",
         ]
-        prompts.append("\n".join(lines))
+    )
+    prompts = []
+    for citation in citations:
+        title = citation.get("title") or ""
+        author = citation.get("author") or ""
+        title_line = f'Book title: "{title}"' if title else "Book title: <not provided>"
+        author_line = f"Author: {author}" if author else "Author: <not provided>"
+        prompts.append(f"{header}\n{title_line}\n{author_line}")
     return prompts
 
 
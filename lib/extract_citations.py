@@ -405,7 +405,17 @@ async def process_book(
     *,
     debug_limit: Optional[int] = None,
     progress_callback: Optional[ProgressCallback] = None,
+    client: Optional[AsyncOpenAI] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
 ) -> ExtractionResult:
+    """
+    Extract citations from every chunk of `config.input_path`.
+
+    Pass a long-lived `client` to reuse its connection pool across books; it is
+    left open. Otherwise a client is created from the config and closed here.
+    Pass a shared `semaphore` to bound in-flight requests across several books
+    processed concurrently; by default each book gets `config.max_concurrency`.
+    """
     input_path = config.input_path
     if not input_path.exists():
         raise FileNotFoundError(f"Book file not found: {input_path}")
@@ -440,9 +450,14 @@ async def process_book(
             raise ValueError("--debug-limit must be positive.")
         chunks = chunks[: debug_limit]
 
-    semaphore = asyncio.Semaphore(config.max_concurrency)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(config.max_concurrency)
 
-    async with AsyncOpenAI(api_key=config.api_key, base_url=config.base_url) as client:
+    owns_client = client is None
+    if owns_client:
+        client = AsyncOpenAI(api_key=config.api_key, base_url=config.base_url)
+
+    try:
         tasks = [
             asyncio.create_task(
                 call_model(
@@ -476,6 +491,9 @@ async def process_book(
             completed += 1
             if progress_callback:
                 progress_callback(completed, total_chunks)
+    finally:
+        if owns_client:
+            await client.close()
 
     chunk_results.sort(key=lambda c: c.chunk_index)
     failures.sort(key=lambda f: f.chunk_index)
@@ -4,6 +4,9 @@ import json
 import datetime
 from typing import Optional
 
+_NEXT_DATA_RE = re.compile(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', re.DOTALL)
+
+
 def get_original_publication_date(goodreads_id: str) -> Optional[datetime.datetime]:
     """
     Fetches the original publication date for a book from Goodreads.
@@ -29,7 +32,7 @@ def get_original_publication_date(goodreads_id: str) -> Optional[datetime.dateti
         html = response.text
         
         # Extract __NEXT_DATA__ JSON blob
-        match = re.search(r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>', html, re.DOTALL)
+        match = _NEXT_DATA_RE.search(html)
         if not match:
             print(f"Error: Could not find __NEXT_DATA__ in {url}")
             return None
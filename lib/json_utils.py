@@ -0,0 +1,44 @@
+"""
+JSON helpers shared by the pipeline stages.
+
+Uses orjson (encodes straight to UTF-8 bytes) when it is installed and falls
+back to the stdlib otherwise; output is equivalent either way (UTF-8, no ASCII
+escaping, 2-space indent when requested).
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, *, indent: bool = False, sort_keys: bool = False, newline: bool = False) -> bytes:
+    """Serialize to UTF-8 bytes; `newline` appends b"\\n" (JSONL) without a second copy under orjson."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, option=option)
+    text = json.dumps(obj, indent=2 if indent else None, sort_keys=sort_keys, ensure_ascii=False)
+    if newline:
+        text += "\n"
+    return text.encode("utf-8")
+
+
+def write_json(path: Path, obj: Any, *, indent: bool = True, sort_keys: bool = False) -> None:
+    """Serialize `obj` and write it to `path` as UTF-8 bytes in one go."""
+    path.write_bytes(dumps(obj, indent=indent, sort_keys=sort_keys))
@@ -1,28 +1,37 @@
 import asyncio
 import copy
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
 import re
 import unicodedata
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Set, Sequence
 from dataclasses import dataclass
 
+import httpx
+from openai import AsyncOpenAI
+
+from lib.adaptive_semaphore import AdaptiveSemaphore
 from lib.extract_citations import (
     ExtractionConfig,
     ProgressCallback,
     process_book,
     write_output,
 )
-from .preprocess_citations import preprocess_data
+from .preprocess_citations import preprocess_to_file
 from .validate_citations import validate_citations
 from lib.bibliography_agent.citation_workflow import CitationWorkflow
 from lib.bibliography_agent.llm_utils import build_llm
 from lib.bibliography_agent.bibliography_tool import SQLiteWikiPeopleIndex, SQLiteGoodreadsCatalog
 from lib.metadata_enricher import MetadataEnricher
+from lib.json_utils import dumps, loads as json_loads, write_json
 
 # Configure module logger
 logger = logging.getLogger(__name__)
@@ -32,23 +41,51 @@ try:
 except ImportError:
     tqdm = None
 
+# httpx only speaks HTTP/2 with the optional `h2` package (httpx[http2]).
+try:
+    import h2  # type: ignore  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 def progress_iter_items(iterable: Sequence[Any], **kwargs: Any) -> Sequence[Any]:
     if tqdm is None:
         return iterable
     return tqdm(iterable, **kwargs)
 
+# Workflow outcomes that count as unresolved and trigger the fallback resolver.
+_UNRESOLVED_MATCH_TYPES = frozenset({"not_found", "unknown", "error"})
+
+
+def _target_author_ids(metadata: Dict[str, Any]) -> List[str]:
+    """Goodreads author ids for an edge: the single `author_id`, else every non-empty `author_ids` entry."""
+    author_id = metadata.get("author_id")
+    if author_id:
+        return [str(author_id)]
+    author_ids = metadata.get("author_ids")
+    if author_ids:
+        return list(map(str, filter(None, author_ids)))
+    return []
+
+
+_AUTHOR_PUNCT = str.maketrans("", "", ".,")
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=65536)
 def _normalize_author(name: str) -> str:
     """Normalize author name for cache lookup.
 
     Strips accents, lowercases, removes periods/commas, and strips common
     prefixes like 'St.' or 'Saint'.
     """
-    # Strip accents
-    name = unicodedata.normalize('NFD', name)
-    name = ''.join(c for c in name if unicodedata.category(c) != 'Mn')
+    # Strip accents (plain ASCII has none, skip the per-character scan)
+    if not name.isascii():
+        name = unicodedata.normalize('NFD', name)
+        name = ''.join(c for c in name if unicodedata.category(c) != 'Mn')
     # Lowercase, strip periods/commas, normalize whitespace
-    name = name.lower().replace('.', '').replace(',', '').strip()
-    name = ' '.join(name.split())
+    name = ' '.join(name.lower().translate(_AUTHOR_PUNCT).split())
     # Strip common prefixes
     for prefix in ('st ', 'saint '):
         if name.startswith(prefix):
@@ -68,17 +105,122 @@ def _find_cached_author(name: str, cache: Dict[str, dict]) -> Optional[dict]:
     return None
 
 
+@lru_cache(maxsize=65536)
 def _normalize_title(title: str) -> str:
     """Normalize a title for dedup comparison."""
     t = title.lower().strip()
     for prefix in ["the ", "a ", "an ", "de ", "on ", "les ", "la ", "le ", "il ", "el "]:
         if t.startswith(prefix):
             t = t[len(prefix):]
-    t = re.sub(r'[^\w\s]', '', t)
-    t = re.sub(r'\s+', ' ', t).strip()
+    t = _NON_WORD_RE.sub('', t)
+    t = _WHITESPACE_RE.sub(' ', t).strip()
     return t
 
 
+def _citation_key(cit: Dict[str, Any]) -> bytes:
+    """Cross-book identity of a citation: normalized title + author."""
+    title = _normalize_title(cit.get("title") or "")
+    author = _normalize_author(cit.get("author") or "")
+    return hashlib.blake2b(f"{title}\0{author}".encode("utf-8"), digest_size=16).digest()
+
+
+# Cross-book workflow results kept in memory (see BookPipeline._workflow_results).
+WORKFLOW_MEMO_SIZE = 65536
+
+
+def _evict_done(memo: "OrderedDict[bytes, asyncio.Future]", limit: int) -> None:
+    """Drop the least recently used finished entries until memo fits in limit.
+
+    Pending futures are never evicted: other books may be waiting on them, and
+    dropping one would let a later occurrence start a duplicate run. The memo
+    can therefore exceed limit while that many citations are in flight.
+    """
+    excess = len(memo) - limit
+    if excess <= 0:
+        return
+    stale = []
+    for key, fut in memo.items():
+        if fut.done():
+            stale.append(key)
+            if len(stale) == excess:
+                break
+    for key in stale:
+        del memo[key]
+
+# Workflow prompts embed the whole citation record; popular citations can
+# carry dozens of excerpts, most of them near-repeats.
+MAX_PROMPT_EXCERPTS = 5
+MAX_PROMPT_EXCERPT_CHARS = 2000
+
+
+def _select_excerpts(
+    excerpts: Sequence[str],
+    k: int = MAX_PROMPT_EXCERPTS,
+    budget: int = MAX_PROMPT_EXCERPT_CHARS,
+) -> List[str]:
+    """Pick up to `k` mutually dissimilar excerpts within `budget` characters.
+
+    Greedy: start from the longest excerpt, then repeatedly add the one whose
+    word set overlaps least (Jaccard) with those already picked, preferring
+    longer excerpts on ties.
+    """
+    pool = [e for e in dict.fromkeys(excerpts) if e]
+    if len(pool) <= k and sum(map(len, pool)) <= budget:
+        return pool
+    words = {e: frozenset(e.lower().split()) for e in pool}
+
+    def distance(a: str, b: str) -> float:
+        union = words[a] | words[b]
+        return 1.0 - len(words[a] & words[b]) / len(union) if union else 0.0
+
+    chosen: List[str] = []
+    used = 0
+    candidates = sorted(pool, key=len, reverse=True)
+    while candidates and len(chosen) < k:
+        best = max(
+            candidates,
+            key=lambda e: (min((distance(e, c) for c in chosen), default=1.0), len(e)),
+        )
+        candidates.remove(best)
+        if used + len(best) > budget and chosen:
+            continue
+        chosen.append(best)
+        used += len(best)
+    return chosen
+
+
+def _prompt_view(cit: Dict[str, Any]) -> Dict[str, Any]:
+    """The citation as sent to the workflow: excerpts trimmed by _select_excerpts."""
+    contexts = cit.get("contexts")
+    if not contexts:
+        return cit
+    selected = _select_excerpts(contexts)
+    if selected == contexts:
+        return cit
+    return {**cit, "contexts": selected}
+
+
+def _prompt_weight(cit: Dict[str, Any]) -> int:
+    """Rough size of the prompts a citation produces (the whole record is embedded)."""
+    weight = len(cit.get("title") or "") + len(cit.get("author") or "")
+    for key in ("contexts", "commentaries"):
+        weight += sum(len(text) for text in cit.get(key) or () if text)
+    return weight
+
+
+def _load_partial_results(path: Path) -> List[dict]:
+    """Read results from a JSONL checkpoint, skipping a torn last line."""
+    if not path.exists():
+        return []
+    results = []
+    for line in path.read_bytes().splitlines():
+        try:
+            results.append(json_loads(line))
+        except ValueError:
+            logger.warning(f"[pipeline] Skipping unreadable checkpoint line in {path.name}")
+    return results
+
+
 def _is_real_gr_id(book_id) -> bool:
     """Check if a book ID is a real Goodreads numeric ID (not web_ prefixed)."""
     if book_id is None:
@@ -102,6 +244,10 @@ class PipelineConfig:
     agent_model: str = "deepseek/deepseek-v3.2"
     agent_concurrency: int = 20
     extract_concurrency: int = 20
+    # Per-citation workflow budget; caps the long tail of slow resolutions.
+    agent_citation_timeout: float = 120.0
+    # Tune agent concurrency between 1 and agent_concurrency from throughput.
+    agent_autotune: bool = False
 
     # Validation
     validate_concurrency: int = 5
@@ -118,19 +264,61 @@ class PipelineConfig:
 
     debug_trace: bool = False
     force_llm_queries: bool = False
+    # Final outputs are compact JSON unless this is set (indent=2).
+    pretty_output: bool = False
 
 class BookPipeline:
     def __init__(self, config: PipelineConfig):
         self.config = config
+        # Shared by every book this pipeline runs, so several books can be in
+        # flight at once while the LLM servers see one bounded request stream.
+        self.extract_semaphore = asyncio.Semaphore(config.extract_concurrency)
+        if config.agent_autotune:
+            self.agent_semaphore = AdaptiveSemaphore(
+                max(1, config.agent_concurrency // 2),
+                maximum=config.agent_concurrency,
+                name="agent-autotune",
+            )
+        else:
+            self.agent_semaphore = asyncio.Semaphore(config.agent_concurrency)
+        self._extract_client: Optional[AsyncOpenAI] = None
+        # Preprocessing is CPU-bound; books in flight share one worker pool.
+        self._preprocess_pool: Optional[ProcessPoolExecutor] = None
+        # Workflow results by _citation_key, shared across books: the same work
+        # cited by many books is resolved once, concurrent lookups wait on it.
+        # Least recently used finished entries beyond WORKFLOW_MEMO_SIZE are dropped.
+        self._workflow_results: "OrderedDict[bytes, asyncio.Future]" = OrderedDict()
         self._setup_workflow()
         self._setup_enricher()
 
+    async def aclose(self):
+        """Close the HTTP clients and preprocessing pool shared across books."""
+        if self._extract_client is not None:
+            await self._extract_client.close()
+            self._extract_client = None
+        await self._agent_http_client.aclose()
+        if self._preprocess_pool is not None:
+            pool, self._preprocess_pool = self._preprocess_pool, None
+            # shutdown() joins the workers; keep the event loop free meanwhile.
+            await asyncio.to_thread(pool.shutdown)
+
     def _setup_workflow(self):
-        # Initialize LLM and Workflow once
+        # Initialize LLM and Workflow once. The agent LLM gets its own pool,
+        # sized to the agent concurrency, which aclose() shuts down. With h2
+        # installed, concurrent calls to TLS endpoints multiplex over HTTP/2.
+        self._agent_http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_keepalive_connections=self.config.agent_concurrency,
+                max_connections=self.config.agent_concurrency * 2,
+            ),
+            timeout=httpx.Timeout(150.0),
+        )
         self.llm = build_llm(
             model=self.config.agent_model,
             api_key=self.config.agent_api_key,
-            base_url=self.config.agent_base_url
+            base_url=self.config.agent_base_url,
+            async_http_client=self._agent_http_client,
         )
 
         self.workflow = CitationWorkflow(
@@ -139,7 +327,8 @@ class BookPipeline:
             wiki_people_path=self.config.wiki_db,
             llm=self.llm,
             verbose=self.config.debug_trace,
-            timeout=120.0,
+            # Enforced per citation in _run_workflow, which also cancels the run.
+            timeout=None,
             force_llm_queries=self.config.force_llm_queries,
         )
 
@@ -320,7 +509,7 @@ class BookPipeline:
         if not pre_path.exists() or force:
              logger.info(f"[pipeline] Preprocessing {book_id}...")
              print(f"[pipeline] Preprocessing {book_id}...")
-             self._run_preprocessing(raw_path, pre_path, source_metadata)
+             await self._run_preprocessing(raw_path, pre_path, source_metadata)
 
         # 3. Validate
         if not val_path.exists() or force:
@@ -359,30 +548,53 @@ class BookPipeline:
                 pbar.n = done
                 pbar.refresh()
 
+        if self._extract_client is None:
+            self._extract_client = AsyncOpenAI(
+                api_key=self.config.extract_api_key,
+                base_url=self.config.extract_base_url,
+            )
+
         try:
-            result = await process_book(config, progress_callback=on_progress)
-            write_output(result, output_path)
+            result = await process_book(
+                config,
+                progress_callback=on_progress,
+                client=self._extract_client,
+                semaphore=self.extract_semaphore,
+            )
+            # Stage outputs are written on a worker thread so a large payload
+            # never stalls the other books' requests on the event loop.
+            await asyncio.to_thread(write_output, result, output_path)
         finally:
             if pbar: pbar.close()
 
-    def _run_preprocessing(self, raw_path: Path, pre_path: Path, meta: Dict[str, Any]):
-        raw_data = json.loads(raw_path.read_text())
-        processed = preprocess_data(
-            raw_data,
-            source_name=raw_path.name,
-            source_title=meta.get("title"),
-            source_authors=meta.get("authors")
+    async def _run_preprocessing(self, raw_path: Path, pre_path: Path, meta: Dict[str, Any]):
+        # Run in a worker process so other books keep extracting/resolving meanwhile.
+        if self._preprocess_pool is None:
+            # Forking a process that runs an event loop and HTTP client threads
+            # can deadlock the child; forkserver children start from a clean
+            # interpreter instead.
+            self._preprocess_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self._preprocess_pool,
+            preprocess_to_file,
+            raw_path,
+            pre_path,
+            meta.get("title"),
+            meta.get("authors"),
         )
-        pre_path.write_text(json.dumps(processed, indent=2, ensure_ascii=False))
 
     async def _run_validation(self, pre_path: Path, val_path: Path, meta: Dict[str, Any]):
-        data = json.loads(pre_path.read_text())
+        data = json_loads(pre_path.read_bytes())
         citations = data.get("citations", [])
         source_title = meta.get("title", "")
         source_authors = meta.get("authors", [])
 
         if not citations:
-            val_path.write_text(json.dumps(data, indent=2, ensure_ascii=False))
+            await asyncio.to_thread(write_json, val_path, data)
             return
 
         validated, stats = await validate_citations(
@@ -401,18 +613,13 @@ class BookPipeline:
             "validation_stats": stats,
             "citations": validated,
         }
-        val_path.write_text(json.dumps(output, indent=2, ensure_ascii=False))
+        await asyncio.to_thread(write_json, val_path, output)
 
         logger.info(f"[pipeline] Validation: {len(citations)} → {len(validated)} citations "
                      f"(removed={stats['removed']}, fixed={stats['fixed']})")
         print(f"[pipeline] Validation: {len(citations)} → {len(validated)} citations "
               f"(removed={stats['removed']}, fixed={stats['fixed']})")
 
-    def _save_checkpoint(self, path: Path, meta: Dict, results: List):
-        """Save checkpoint with partial results."""
-        path.write_text(json.dumps({"source": meta, "citations": results, "complete": False}, indent=2, ensure_ascii=False))
-        logger.debug(f"[pipeline] Checkpoint saved: {len(results)} citations")
-
     def _add_to_author_cache(self, cache: Dict[str, dict], author_name: str, result_dict: dict):
         """Add a resolved result to the author cache, including bare last-name variant."""
         key = _normalize_author(author_name)
@@ -555,24 +762,29 @@ class BookPipeline:
         return results
 
     async def _run_workflow(self, pre_path: Path, final_path: Path, meta: Dict[str, Any]):
-        data = json.loads(pre_path.read_text())
+        data = json_loads(pre_path.read_bytes())
         citations = data.get("citations", [])
 
         if not citations:
             # Write empty result
-            final_path.write_text(json.dumps({"source": meta, "citations": []}, indent=2))
+            await asyncio.to_thread(
+                write_json, final_path, {"source": meta, "citations": []}, indent=self.config.pretty_output
+            )
             return
 
-        # Checkpoint support
+        # Checkpoint support: every finished citation is appended to a JSONL
+        # sidecar, so a crash mid-book loses at most the line being written.
+        # (.checkpoint.json is the older whole-file format, still read on resume.)
         checkpoint_path = final_path.with_suffix('.checkpoint.json')
+        partial_path = final_path.with_suffix('.partial.jsonl')
 
         # Load existing checkpoint if resuming
         existing_results = []
-        processed_keys = set()
         if checkpoint_path.exists():
-            checkpoint = json.loads(checkpoint_path.read_text())
-            existing_results = checkpoint.get("citations", [])
-            processed_keys = {(r["raw"].get("author"), r["raw"].get("title")) for r in existing_results}
+            existing_results = json_loads(checkpoint_path.read_bytes()).get("citations", [])
+        existing_results.extend(_load_partial_results(partial_path))
+        processed_keys = {(r["raw"].get("author"), r["raw"].get("title")) for r in existing_results}
+        if existing_results:
             logger.info(f"[pipeline] Resuming from checkpoint: {len(existing_results)} already processed")
             print(f"[pipeline] Resuming from checkpoint: {len(existing_results)} already processed")
 
@@ -596,12 +808,13 @@ class BookPipeline:
                 self._add_to_author_cache(author_cache, author, r)
 
         # Prepare tasks
-        sem = asyncio.Semaphore(self.config.agent_concurrency)
+        sem = self.agent_semaphore
 
         # Stats for logging
         stats = {
             "total": len(citations),
             "cache_hits": 0,
+            "cross_book_hits": 0,
             "workflow_success": 0,
             "workflow_error": 0,
             "fallback_triggered": 0,
@@ -610,22 +823,68 @@ class BookPipeline:
         }
 
         # Count already-processed successes from checkpoint
-        for r in existing_results:
-            edge = r.get("edge", {})
-            target_type = edge.get("target_type", "unknown")
-            if target_type not in ["not_found", "unknown", "error"]:
-                stats["workflow_success"] += 1
+        stats["workflow_success"] += sum(
+            1 for r in existing_results
+            if r.get("edge", {}).get("target_type", "unknown") not in _UNRESOLVED_MATCH_TYPES
+        )
 
-        async def process_safe(cit):
+        async def run_workflow(cit):
             async with sem:
                 cit_desc = f"'{cit.get('author', '?')}' - '{cit.get('title', '[no title]')}'"
                 try:
-                    res = await self.workflow.run(citation=cit)
-                    return (cit, res)
+                    handler = self.workflow.run(citation=_prompt_view(cit))
+                    try:
+                        async with asyncio.timeout(self.config.agent_citation_timeout):
+                            return await handler
+                    except TimeoutError:
+                        # Stop the run's steps so their in-flight LLM requests
+                        # are cancelled and release their pool connections.
+                        await handler.cancel_run()
+                        raise TimeoutError(
+                            f"workflow exceeded {self.config.agent_citation_timeout:g}s"
+                        ) from None
                 except Exception as e:
                     logger.error(f"[workflow] Error processing {cit_desc}: {type(e).__name__}: {e}")
                     logger.debug(f"[workflow] Full citation that failed: {json.dumps(cit, ensure_ascii=False)}")
-                    return (cit, {"error": str(e), "match_type": "error"})
+                    return {"error": str(e), "match_type": "error"}
+
+        memo = self._workflow_results
+
+        def forget(key, shared):
+            if memo.get(key) is shared:
+                del memo[key]
+
+        async def process_safe(cit):
+            key = _citation_key(cit)
+            while (shared := memo.get(key)) is not None:
+                memo.move_to_end(key)
+                try:
+                    # Shielded, so cancelling this book never cancels the
+                    # future other books are waiting on.
+                    res = await asyncio.shield(shared)
+                except asyncio.CancelledError:
+                    # The owning book was cancelled: that is a miss here, not
+                    # our own cancellation, so run the workflow ourselves.
+                    if not shared.cancelled() or asyncio.current_task().cancelling():
+                        raise
+                    continue
+                stats["cross_book_hits"] += 1
+                return (cit, copy.deepcopy(res))
+
+            shared = asyncio.get_running_loop().create_future()
+            memo[key] = shared
+            _evict_done(memo, WORKFLOW_MEMO_SIZE)
+            try:
+                res = await run_workflow(cit)
+            except BaseException:
+                forget(key, shared)
+                shared.cancel()
+                raise
+            if "error" in res:
+                # Let a later occurrence retry instead of inheriting the failure.
+                forget(key, shared)
+            shared.set_result(res)
+            return (cit, copy.deepcopy(res))
 
         # Separate citations into cache-hittable (author-only) and must-run (has title)
         cached_results: List[dict] = []
@@ -651,158 +910,176 @@ class BookPipeline:
 
         logger.info(f"[cache] {stats['cache_hits']} cache hits, {len(citations_needing_workflow)} citations need workflow")
 
+        # Longest prompts first, so the slow tail overlaps with the short ones
+        # instead of starting last.
+        citations_needing_workflow.sort(key=_prompt_weight, reverse=True)
+
         pbar = tqdm(total=len(citations_to_process), desc="  Resolving Citations", leave=False) if tqdm else None
 
         # Count cached results in progress bar
         if pbar and cached_results:
             pbar.update(len(cached_results))
 
-        tasks = [process_safe(cit) for cit in citations_needing_workflow]
-        results = list(existing_results)  # Start with checkpoint results
-        results.extend(cached_results)  # Add cache hits
-
-        # Use as_completed to update progress bar as items finish
-        for future in asyncio.as_completed(tasks):
-            cit, res = await future
+        # A fixed set of workers pulls citations off a shared iterator and hands
+        # each result over as soon as it is ready, so one slow citation never
+        # holds back the rest and no per-citation task is created up front.
+        todo = iter(citations_needing_workflow)
+        finished: asyncio.Queue = asyncio.Queue()
 
-            match_type = res.get("match_type", "unknown")
-            metadata = res.get("metadata", {})
-            had_error = "error" in res
+        async def worker():
+            for cit in todo:
+                finished.put_nowait(await process_safe(cit))
 
-            if had_error:
-                stats["workflow_error"] += 1
-            elif match_type not in ["not_found", "unknown", "error"]:
-                stats["workflow_success"] += 1
-
-            # --- FALLBACK: Trigger for errors, not_found, or unknown ---
-            if match_type in ["not_found", "unknown", "error"]:
-                stats["fallback_triggered"] += 1
-                logger.info(f"[fallback] Triggering for: title='{cit.get('title')}', author='{cit.get('author')}' (reason: {match_type})")
-
-                try:
-                    fallback_res = await self.enricher.resolve_citation_fallback(cit, meta)
-                    fallback_match = fallback_res.get("match_type", "not_found")
-
-                    if fallback_match in ["book", "person"]:
-                        stats["fallback_success"] += 1
-                        match_type = fallback_match
-                        metadata = fallback_res.get("metadata", {})
-                        logger.info(f"[fallback] Success: {match_type} - {metadata.get('title') or metadata.get('authors', ['?'])[0] if metadata.get('authors') else '?'}")
-
-                        # Generate synthetic ID for books without one
-                        if match_type == "book" and not metadata.get("book_id"):
-                            import hashlib
-                            slug = f"{metadata.get('title', '')}{metadata.get('original_year', '')}"
-                            metadata["book_id"] = f"web_{hashlib.md5(slug.encode()).hexdigest()[:8]}"
-                    else:
-                        logger.debug(f"[fallback] No match found for: {cit.get('author')}")
-                except Exception as e:
-                    logger.error(f"[fallback] Error during fallback: {e}")
-
-            # Build Edge
-            target_book_id = metadata.get("book_id")
-            target_author_ids = []
-            if metadata.get("author_id"):
-                 target_author_ids.append(str(metadata.get("author_id")))
-            elif metadata.get("author_ids"):
-                 target_author_ids = [str(a) for a in metadata.get("author_ids")]
-
-            wiki_match = metadata.get("wikipedia_match")
-
-            # --- ENRICHMENT ---
-            # Skip enrichment calls when fallback already provided the data
-            enrichment = {}
-
-            target_title = metadata.get("title") or cit.get("title")
-            target_authors = metadata.get("authors") or [cit.get("author")]
-            target_author_name = target_authors[0] if target_authors else None
-
-            # 1. Enrich Book (get publication year)
-            # Use fallback-provided original_year if available, otherwise call enricher
-            if metadata.get("original_year"):
-                enrichment["original_year"] = metadata["original_year"]
-                logger.debug(f"[enrich] Book year from fallback: {target_title} -> {metadata['original_year']}")
-            elif target_book_id and target_title:
-                try:
-                    year = await self.enricher.enrich_book(str(target_book_id), target_title, target_author_name or "")
-                    if year:
-                        enrichment["original_year"] = year
-                        logger.debug(f"[enrich] Book year: {target_title} -> {year}")
-                except Exception as e:
-                    logger.warning(f"[enrich] Book enrichment failed: {e}")
-            elif match_type == "book" and target_title:
-                 try:
-                     year = await self.enricher.enrich_book(None, target_title, target_author_name or "")
-                     if year:
-                        enrichment["original_year"] = year
-                 except Exception as e:
-                    logger.warning(f"[enrich] Book enrichment (no ID) failed: {e}")
-
-            # 2. Enrich Author (get birth/death years)
-            # Use fallback-provided birth/death years if available
-            fallback_has_bio = metadata.get("birth_year") or metadata.get("death_year")
-            if fallback_has_bio:
-                auth_meta = {
-                    k: metadata[k] for k in ("birth_year", "death_year", "nationality", "main_genre")
-                    if metadata.get(k)
-                }
-                if auth_meta:
-                    stats["enrichment_success"] += 1
-                    enrichment["author_meta"] = auth_meta
-                    logger.debug(f"[enrich] Author from fallback: {target_author_name} -> birth={auth_meta.get('birth_year')}, death={auth_meta.get('death_year')}")
-
-                    if not wiki_match:
-                        wiki_match = {"title": target_author_name}
-                    if auth_meta.get("birth_year") and not wiki_match.get("birth_year"):
-                        wiki_match["birth_year"] = auth_meta["birth_year"]
-                    if auth_meta.get("death_year") and not wiki_match.get("death_year"):
-                        wiki_match["death_year"] = auth_meta["death_year"]
-            elif target_author_name:
-                try:
-                    auth_meta = await self.enricher.enrich_author(target_author_name)
-                    if auth_meta:
-                        stats["enrichment_success"] += 1
-                        enrichment["author_meta"] = auth_meta
-                        logger.debug(f"[enrich] Author: {target_author_name} -> birth={auth_meta.get('birth_year')}, death={auth_meta.get('death_year')}")
-
-                        # IMPORTANT: Merge author dates into wiki_match / target_person
-                        if not wiki_match:
-                            wiki_match = {"title": target_author_name}
-
-                        # Only add dates if not already present
-                        if auth_meta.get("birth_year") and not wiki_match.get("birth_year"):
-                            wiki_match["birth_year"] = auth_meta["birth_year"]
-                        if auth_meta.get("death_year") and not wiki_match.get("death_year"):
-                            wiki_match["death_year"] = auth_meta["death_year"]
-                except Exception as e:
-                    logger.warning(f"[enrich] Author enrichment failed for '{target_author_name}': {e}")
-
-            # Merge enrichment into metadata
-            metadata.update(enrichment)
-
-            result_dict = {
-                "raw": cit,
-                "goodreads_match": metadata if match_type == "book" else None,
-                "wikipedia_match": wiki_match,
-                "edge": {
-                    "target_type": match_type,
-                    "target_book_id": target_book_id,
-                    "target_author_ids": target_author_ids,
-                    "target_person": wiki_match  # Now includes enriched birth/death
-                }
-            }
-            results.append(result_dict)
-
-            # Add to author cache for future citations in this book
-            author = cit.get("author")
-            if author and match_type not in ["error"]:
-                self._add_to_author_cache(author_cache, author, result_dict)
-
-            # Save checkpoint every 5 results
-            if len(results) % 5 == 0:
-                self._save_checkpoint(checkpoint_path, meta, results)
+        results = list(existing_results)  # Start with checkpoint results
+        results.extend(cached_results)  # Add cache hits
 
-            if pbar: pbar.update(1)
+        # Unbuffered: each line reaches the OS as soon as it is written.
+        with partial_path.open("ab", buffering=0) as partial:
+            for result_dict in cached_results:
+                partial.write(dumps(result_dict, newline=True))
+
+            # The workers live in a TaskGroup around the consumer loop: a worker
+            # error cancels the rest and propagates here instead of leaving the
+            # loop waiting on a result that never comes, and cancelling the book
+            # cancels its workers (and their in-flight LLM calls) with it.
+            async with asyncio.TaskGroup() as workers:
+                for _ in range(min(self.config.agent_concurrency, len(citations_needing_workflow))):
+                    workers.create_task(worker())
+
+                for _ in range(len(citations_needing_workflow)):
+                    cit, res = await finished.get()
+
+                    match_type = res.get("match_type", "unknown")
+                    metadata = res.get("metadata") or {}
+                    unresolved = match_type in _UNRESOLVED_MATCH_TYPES
+
+                    if "error" in res:
+                        stats["workflow_error"] += 1
+                    elif not unresolved:
+                        stats["workflow_success"] += 1
+
+                    # --- FALLBACK: Trigger for errors, not_found, or unknown ---
+                    if unresolved:
+                        stats["fallback_triggered"] += 1
+                        logger.info(f"[fallback] Triggering for: title='{cit.get('title')}', author='{cit.get('author')}' (reason: {match_type})")
+
+                        try:
+                            fallback_res = await self.enricher.resolve_citation_fallback(cit, meta)
+                            fallback_match = fallback_res.get("match_type", "not_found")
+
+                            if fallback_match in ("book", "person"):
+                                stats["fallback_success"] += 1
+                                match_type = fallback_match
+                                metadata = fallback_res.get("metadata") or {}
+                                logger.info(f"[fallback] Success: {match_type} - {metadata.get('title') or metadata.get('authors', ['?'])[0] if metadata.get('authors') else '?'}")
+
+                                # Generate synthetic ID for books without one
+                                if match_type == "book" and not metadata.get("book_id"):
+                                    slug = f"{metadata.get('title', '')}{metadata.get('original_year', '')}"
+                                    metadata["book_id"] = f"web_{hashlib.md5(slug.encode()).hexdigest()[:8]}"
+                            else:
+                                logger.debug(f"[fallback] No match found for: {cit.get('author')}")
+                        except Exception as e:
+                            logger.error(f"[fallback] Error during fallback: {e}")
+
+                    # Build Edge
+                    target_book_id = metadata.get("book_id")
+                    target_author_ids = _target_author_ids(metadata)
+
+                    wiki_match = metadata.get("wikipedia_match")
+
+                    # --- ENRICHMENT ---
+                    # Skip enrichment calls when fallback already provided the data
+                    enrichment = {}
+
+                    target_title = metadata.get("title") or cit.get("title")
+                    target_authors = metadata.get("authors") or [cit.get("author")]
+                    target_author_name = target_authors[0] if target_authors else None
+
+                    # 1. Enrich Book (get publication year)
+                    # Use fallback-provided original_year if available, otherwise call enricher
+                    if metadata.get("original_year"):
+                        enrichment["original_year"] = metadata["original_year"]
+                        logger.debug(f"[enrich] Book year from fallback: {target_title} -> {metadata['original_year']}")
+                    elif target_book_id and target_title:
+                        try:
+                            year = await self.enricher.enrich_book(str(target_book_id), target_title, target_author_name or "")
+                            if year:
+                                enrichment["original_year"] = year
+                                logger.debug(f"[enrich] Book year: {target_title} -> {year}")
+                        except Exception as e:
+                            logger.warning(f"[enrich] Book enrichment failed: {e}")
+                    elif match_type == "book" and target_title:
+                         try:
+                             year = await self.enricher.enrich_book(None, target_title, target_author_name or "")
+                             if year:
+                                enrichment["original_year"] = year
+                         except Exception as e:
+                            logger.warning(f"[enrich] Book enrichment (no ID) failed: {e}")
+
+                    # 2. Enrich Author (get birth/death years)
+                    # Use fallback-provided birth/death years if available
+                    fallback_has_bio = metadata.get("birth_year") or metadata.get("death_year")
+                    if fallback_has_bio:
+                        auth_meta = {
+                            k: metadata[k] for k in ("birth_year", "death_year", "nationality", "main_genre")
+                            if metadata.get(k)
+                        }
+                        if auth_meta:
+                            stats["enrichment_success"] += 1
+                            enrichment["author_meta"] = auth_meta
+                            logger.debug(f"[enrich] Author from fallback: {target_author_name} -> birth={auth_meta.get('birth_year')}, death={auth_meta.get('death_year')}")
+
+                            if not wiki_match:
+                                wiki_match = {"title": target_author_name}
+                            if auth_meta.get("birth_year") and not wiki_match.get("birth_year"):
+                                wiki_match["birth_year"] = auth_meta["birth_year"]
+                            if auth_meta.get("death_year") and not wiki_match.get("death_year"):
+                                wiki_match["death_year"] = auth_meta["death_year"]
+                    elif target_author_name:
+                        try:
+                            auth_meta = await self.enricher.enrich_author(target_author_name)
+                            if auth_meta:
+                                stats["enrichment_success"] += 1
+                                enrichment["author_meta"] = auth_meta
+                                logger.debug(f"[enrich] Author: {target_author_name} -> birth={auth_meta.get('birth_year')}, death={auth_meta.get('death_year')}")
+
+                                # IMPORTANT: Merge author dates into wiki_match / target_person
+                                if not wiki_match:
+                                    wiki_match = {"title": target_author_name}
+
+                                # Only add dates if not already present
+                                if auth_meta.get("birth_year") and not wiki_match.get("birth_year"):
+                                    wiki_match["birth_year"] = auth_meta["birth_year"]
+                                if auth_meta.get("death_year") and not wiki_match.get("death_year"):
+                                    wiki_match["death_year"] = auth_meta["death_year"]
+                        except Exception as e:
+                            logger.warning(f"[enrich] Author enrichment failed for '{target_author_name}': {e}")
+
+                    # Merge enrichment into metadata
+                    metadata.update(enrichment)
+
+                    result_dict = {
+                        "raw": cit,
+                        "goodreads_match": metadata if match_type == "book" else None,
+                        "wikipedia_match": wiki_match,
+                        "edge": {
+                            "target_type": match_type,
+                            "target_book_id": target_book_id,
+                            "target_author_ids": target_author_ids,
+                            "target_person": wiki_match  # Now includes enriched birth/death
+                        }
+                    }
+                    results.append(result_dict)
+
+                    # Add to author cache for future citations in this book
+                    author = cit.get("author")
+                    if author and match_type != "error":
+                        self._add_to_author_cache(author_cache, author, result_dict)
+
+                    partial.write(dumps(result_dict, newline=True))
+
+                    if pbar: pbar.update(1)
 
         if pbar: pbar.close()
 
@@ -815,6 +1092,7 @@ class BookPipeline:
         print("="*50)
         print(f"  Total Citations:    {stats['total']}")
         print(f"  Cache Hits:         {stats['cache_hits']}")
+        print(f"  Cross-book Hits:    {stats['cross_book_hits']}")
         print(f"  Workflow Success:   {stats['workflow_success']} ({100*stats['workflow_success']//max(1,stats['total'])}%)")
         print(f"  Not Found:          {stats['total'] - stats['workflow_success'] - stats['workflow_error'] - stats['cache_hits']}")
         print(f"  Errors:             {stats['workflow_error']}")
@@ -835,9 +1113,9 @@ class BookPipeline:
             "source": meta,
             "citations": results
         }
-        final_path.write_text(json.dumps(output, indent=2, ensure_ascii=False))
+        await asyncio.to_thread(write_json, final_path, output, indent=self.config.pretty_output)
 
         # Remove checkpoint after successful completion
-        if checkpoint_path.exists():
-            checkpoint_path.unlink()
-            logger.info("[pipeline] Checkpoint removed after successful completion")
+        checkpoint_path.unlink(missing_ok=True)
+        partial_path.unlink(missing_ok=True)
+        logger.info("[pipeline] Checkpoint removed after successful completion")
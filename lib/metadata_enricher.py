@@ -8,6 +8,7 @@ import logging
 from llama_index.core.llms import LLM
 from lib.bibliography_agent.llm_utils import build_llm
 from lib.goodreads_scraper import get_original_publication_date
+from lib.json_utils import loads as json_loads, write_json
 from lib.wikipedia_agent import WikipediaLookup
 
 if TYPE_CHECKING:
@@ -17,6 +18,11 @@ logger = logging.getLogger(__name__)
 
 MAX_LIFESPAN = 120
 
+_NON_DIGIT_RE = re.compile(r'\D')
+_YEAR_RE = re.compile(r'\d{4}')
+_LIFE_YEAR_RE = re.compile(r'\d{3,4}')
+_SIGNED_YEAR_RE = re.compile(r'-?\d{3,4}')
+
 
 def validate_dates(birth, death):
     """Sanitize a birth/death pair. Returns (birth, death) with fixes applied."""
@@ -100,7 +106,7 @@ class MetadataEnricher:
         if not path.exists():
             return {}
         try:
-            return json.loads(path.read_text())
+            return json_loads(path.read_bytes())
         except Exception:
             return {}
 
@@ -109,14 +115,14 @@ class MetadataEnricher:
         if self.dates_updates and self.auto_update:
             self.dates_cache.update(self.dates_updates)
             self.dates_path.parent.mkdir(parents=True, exist_ok=True)
-            self.dates_path.write_text(json.dumps(self.dates_cache, indent=2, sort_keys=True))
+            write_json(self.dates_path, self.dates_cache, sort_keys=True)
             logger.info(f"[enricher] Saved {len(self.dates_updates)} date updates to {self.dates_path}")
             self.dates_updates = {}
 
         if self.authors_updates and self.auto_update:
             self.authors_cache.update(self.authors_updates)
             self.authors_path.parent.mkdir(parents=True, exist_ok=True)
-            self.authors_path.write_text(json.dumps(self.authors_cache, indent=2, sort_keys=True))
+            write_json(self.authors_path, self.authors_cache, sort_keys=True)
             logger.info(f"[enricher] Saved {len(self.authors_updates)} author updates to {self.authors_path}")
             self.authors_updates = {}
 
@@ -148,9 +154,9 @@ class MetadataEnricher:
                 if date_obj:
                     if isinstance(date_obj, str):
                         if "BC" in date_obj:
-                            year = -int(re.sub(r'\D', '', date_obj))
+                            year = -int(_NON_DIGIT_RE.sub('', date_obj))
                         else:
-                            year = int(re.sub(r'\D', '', date_obj))
+                            year = int(_NON_DIGIT_RE.sub('', date_obj))
                     else:
                         year = date_obj.year
 
@@ -168,7 +174,7 @@ class MetadataEnricher:
                  date_str = info.get("published", "") or info.get("first_published", "")
                  if date_str:
                      # Parse year from "25 January 1949" or "1949 (UK)"
-                     match = re.search(r'\d{4}', date_str)
+                     match = _YEAR_RE.search(date_str)
                      if match:
                          year = int(match.group(0))
                          logger.info(f"[enricher] Wikipedia web found year for '{title}': {year}")
@@ -242,14 +248,14 @@ class MetadataEnricher:
                 else:
                     if 'born' in dates:
                         # Extract year from formats like "April 15, 1452" or "c. 428 BC"
-                        y = re.search(r'\d{3,4}', dates['born'])
+                        y = _LIFE_YEAR_RE.search(dates['born'])
                         if y:
                             birth_year = int(y.group(0))
                             if 'BC' in dates['born'] or 'BCE' in dates['born']:
                                 birth_year = -birth_year
                             meta['birth_year'] = birth_year
                     if 'died' in dates:
-                        y = re.search(r'\d{3,4}', dates['died'])
+                        y = _LIFE_YEAR_RE.search(dates['died'])
                         if y:
                             death_year = int(y.group(0))
                             if 'BC' in dates['died'] or 'BCE' in dates['died']:
@@ -301,7 +307,7 @@ class MetadataEnricher:
         try:
             resp = await self.llm.acomplete(prompt)
             text = resp.text.strip()
-            match = re.search(r'-?\d{3,4}', text)
+            match = _SIGNED_YEAR_RE.search(text)
             if match:
                 return int(match.group(0))
         except Exception as e:
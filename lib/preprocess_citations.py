@@ -7,18 +7,20 @@ Usage:
 """
 
 import argparse
-import json
 import re
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
 
+from lib.json_utils import loads as json_loads, write_json
+
 
 Citation = Dict[str, Any]
 Heuristic = Callable[[List[Citation]], List[Citation]]
 
 
 def load_citations(path: Path) -> List[Citation]:
-    data = json.loads(path.read_text())
+    data = json_loads(path.read_bytes())
     rows: List[Citation] = []
     for chunk in data.get("chunks", []):
         for citation in chunk.get("citations", []):
@@ -104,10 +106,17 @@ def collapse_author_only(citations: List[Citation]) -> List[Citation]:
     return result
 
 
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+# The normalizers are called pairwise by merge_similar_citations, so the same
+# few hundred strings get normalized over and over; memoize them.
+@lru_cache(maxsize=65536)
 def normalize_text(text: str) -> str:
-    return re.sub(r"\s+", " ", text).strip().casefold()
+    return " ".join(text.split()).casefold()
 
 
+@lru_cache(maxsize=65536)
 def normalize_title(title: str) -> str:
     """
     Normalize titles for loose dedup:
@@ -119,7 +128,7 @@ def normalize_title(title: str) -> str:
     for sep in (":", "-", "_", "(", "["):
         if sep in lowered:
             lowered = lowered.split(sep, 1)[0]
-    cleaned = re.sub(r"[^a-z0-9]+", " ", lowered)
+    cleaned = _NON_ALNUM_RE.sub(" ", lowered)
     return cleaned.strip()
 
 
@@ -289,7 +298,7 @@ def _load_author_aliases_for_normalization() -> Dict[str, str]:
     mapping: Dict[str, str] = {}
     if aliases_path.exists():
         try:
-            raw = json.loads(aliases_path.read_text())
+            raw = json_loads(aliases_path.read_bytes())
             for canonical, variants in raw.items():
                 for v in variants:
                     mapping[v.lower()] = canonical
@@ -417,7 +426,7 @@ def preprocess(
     source_title: Optional[str] = None,
     source_authors: Optional[Sequence[str]] = None,
 ) -> Dict[str, Any]:
-    data = json.loads(path.read_text(encoding="utf-8"))
+    data = json_loads(path.read_bytes())
     return preprocess_data(
         data, 
         source_name=path.name,
@@ -426,15 +435,24 @@ def preprocess(
     )
 
 
+def preprocess_to_file(
+    path: Path,
+    output_path: Path,
+    source_title: Optional[str] = None,
+    source_authors: Optional[Sequence[str]] = None,
+) -> None:
+    """Preprocess `path` and write the result; takes only picklable args so it can run in a worker process."""
+    write_json(output_path, preprocess(path, source_title, source_authors))
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Preprocess citation JSON output.")
     ap.add_argument("json_path", type=Path, help="Path to run_single_file JSON.")
     args = ap.parse_args()
 
     result = preprocess(args.json_path)
-    payload = json.dumps(result, indent=2, ensure_ascii=False)
     output_path = args.json_path.with_name(f"{args.json_path.stem}_filtered.json")
-    output_path.write_text(payload)
+    write_json(output_path, result)
     print(f"Wrote filtered citations to {output_path}")
 
 
@@ -33,6 +33,9 @@ from pyppeteer.page import Page
 from llama_index.core.tools import FunctionTool
 from llama_index.core.tools.tool_spec.base import BaseToolSpec
 
+_CITATION_MARKER_RE = re.compile(r'\[[\d\w]+\]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 
 class WikipediaToolSpec(BaseToolSpec):
     """
@@ -185,8 +188,8 @@ class WikipediaToolSpec(BaseToolSpec):
                         key = header.get_text(strip=True)
                         value = data.get_text(separator=' ', strip=True)
                         # Clean up common formatting issues
-                        value = re.sub(r'\[[\d\w]+\]', '', value)  # Remove citation markers
-                        value = re.sub(r'\s+', ' ', value).strip()
+                        value = _CITATION_MARKER_RE.sub('', value)  # Remove citation markers
+                        value = _WHITESPACE_RE.sub(' ', value).strip()
                         if key and value and len(value) < 500:
                             output += f"  {key}: {value}\n"
                 output += "\n"
@@ -198,8 +201,8 @@ class WikipediaToolSpec(BaseToolSpec):
                 for p in content_div.find_all('p', recursive=False)[:4]:
                     text = p.get_text(strip=True)
                     # Clean up
-                    text = re.sub(r'\[[\d\w]+\]', '', text)
-                    text = re.sub(r'\s+', ' ', text).strip()
+                    text = _CITATION_MARKER_RE.sub('', text)
+                    text = _WHITESPACE_RE.sub(' ', text).strip()
                     if text and len(text) > 50:
                         paragraphs.append(text)
                 
@@ -255,8 +258,8 @@ class WikipediaToolSpec(BaseToolSpec):
                 if header and cell:
                     key = header.get_text(strip=True)
                     value = cell.get_text(separator=' ', strip=True)
-                    value = re.sub(r'\[[\d\w]+\]', '', value)
-                    value = re.sub(r'\s+', ' ', value).strip()
+                    value = _CITATION_MARKER_RE.sub('', value)
+                    value = _WHITESPACE_RE.sub(' ', value).strip()
                     if key and value:
                         data[key] = value
                         output += f"{key}: {value}\n"
@@ -302,8 +305,8 @@ class WikipediaToolSpec(BaseToolSpec):
             paragraphs = []
             for p in content_div.find_all('p', recursive=False)[:5]:
                 text = p.get_text(strip=True)
-                text = re.sub(r'\[[\d\w]+\]', '', text)
-                text = re.sub(r'\s+', ' ', text).strip()
+                text = _CITATION_MARKER_RE.sub('', text)
+                text = _WHITESPACE_RE.sub(' ', text).strip()
                 if text and len(text) > 30:
                     paragraphs.append(text)
             
@@ -2,13 +2,35 @@
 import argparse
 import json
 import mmap
-import multiprocessing as mp
+import re
+import sqlite3
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# orjson parses bytes directly (no decode step); stdlib json also accepts bytes.
+json_loads = orjson.loads if orjson is not None else json.loads
+
+try:
+    # Optional native locate step; build with build_scan.py.
+    from _mp_scan import ffi as _scan_ffi, lib as _scan_lib  # type: ignore
+except ImportError:  # pragma: no cover
+    _scan_ffi = _scan_lib = None
+
+# (pos, end) -> [start, end) span of the next candidate line, or None.
+Locator = Callable[[int, int], Optional[Tuple[int, int]]]
 
 DEFAULT_JSON_PATH = "datasets/goodreads_books.json"
+# Built once by index_builder.py: book_id -> (offset, length) into the JSONL.
+DEFAULT_INDEX_PATH = "datasets/goodreads_books_offsets.db"
 # Middle entry from tests: "El Espejo de mi Alma"
 MIDDLE_BOOK_ID = "12841265"
 
@@ -53,53 +75,157 @@ def line_chunk_boundaries(mm: mmap.mmap, workers: int) -> List[int]:
         out.append(file_size)
     return out
 
-# ---------- Workers ----------
+# ---------- Scanning ----------
+
+
+def line_bounds(mm: mmap.mmap, idx: int) -> Tuple[int, int]:
+    """Return the [start, end) byte span of the line containing offset `idx`."""
+    start = mm.rfind(b"\n", 0, idx) + 1
+    end = mm.find(b"\n", idx)
+    if end == -1:
+        end = mm.size()
+    return start, end
+
+
+def book_id_pattern(target_id: str) -> "re.Pattern[bytes]":
+    """Compiled bytes pattern for the `book_id` field, tolerant of compact or spaced JSON."""
+    return re.compile(rb'"book_id":\s*"' + re.escape(target_id.encode("utf-8")) + rb'"')
+
+
+def regex_locator(mm: mmap.mmap, target_id: str) -> Locator:
+    """Locate candidate lines with the precompiled `book_id` pattern (one `re` search per hit)."""
+    pattern = book_id_pattern(target_id)
+
+    def locate(pos: int, end: int) -> Optional[Tuple[int, int]]:
+        match = pattern.search(mm, pos, end)
+        return line_bounds(mm, match.start()) if match else None
+
+    return locate
+
+
+def native_locator(buf: Any, target_id: str) -> Locator:
+    """
+    Locate candidate lines with the `_mp_scan` extension (memmem + memrchr/memchr).
+    memmem has no whitespace wildcard, so the spaced Goodreads form is tried first and
+    the compact form only if the spaced one is absent from the range.
+    """
+    tid = target_id.encode("utf-8")
+    needles = (b'"book_id": "' + tid + b'"', b'"book_id":"' + tid + b'"')
+    line_start = _scan_ffi.new("size_t *")
+    line_end = _scan_ffi.new("size_t *")
+
+    def locate(pos: int, end: int) -> Optional[Tuple[int, int]]:
+        for needle in needles:
+            if _scan_lib.find_line_with(buf, end, pos, needle, len(needle), line_start, line_end) >= 0:
+                return line_start[0], line_end[0]
+        return None
+
+    return locate
+
+
+def scan_range(
+    mm: mmap.mmap,
+    locate: Locator,
+    target_id: str,
+    start: int,
+    end: int,
+    found: Optional[threading.Event] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Search [start, end) of the mapped JSONL for lines carrying the exact `"book_id": "<id>"`
+    field, so ids that merely appear in isbn/similar_books/etc. are never decoded;
+    the parse is only a confirmation.
+    """
+    pos = start
+    while found is None or not found.is_set():
+        span = locate(pos, end)
+        if span is None:
+            return None
+        line_start, line_end = span
+        pos = line_end + 1
+        # The match lies inside this line, so it is never empty; no strip()
+        # copy needed either, as both JSON decoders accept a trailing "\r".
+        try:
+            rec = json_loads(mm[line_start:line_end])
+        except ValueError:  # JSONDecodeError, or UnicodeDecodeError on raw bytes
+            continue
+        rec_id = str(rec.get("book_id") or rec.get("id") or "")
+        if rec_id == target_id:
+            return rec
+    return None
+
+
+def find_record(mm: mmap.mmap, target_id: str, workers: int = 1) -> Optional[Dict[str, Any]]:
+    """
+    Find `target_id` in the mapped JSONL, optionally splitting the buffer across threads.
+    Uses the native locator when `_mp_scan` is built (cffi drops the GIL for the call),
+    else the regex one. Threads share the one mmap (no copies, no pickling); the first
+    hit sets `found` so the others stop at their next candidate.
+    """
+    if _scan_lib is None:
+        return _find_record(mm, regex_locator(mm, target_id), target_id, workers)
+    with _scan_ffi.from_buffer(mm) as buf:
+        return _find_record(mm, native_locator(buf, target_id), target_id, workers)
 
 
-def worker_scan(path: str, start: int, end: int, target_id: str,
-                found_event: mp.Event, result_q: mp.Queue) -> None:
-    target_bytes = target_id.encode("utf-8")
+def _find_record(mm: mmap.mmap, locate: Locator, target_id: str, workers: int) -> Optional[Dict[str, Any]]:
+    if workers <= 1:
+        return scan_range(mm, locate, target_id, 0, mm.size())
+
+    bounds = line_chunk_boundaries(mm, workers)
+    found = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(bounds) - 1)
     try:
-        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-            pos = start
-            mm.seek(pos)
-            while not found_event.is_set() and pos < end:
-                line = mm.readline()
-                if not line:
-                    break
-                pos_next = mm.tell()
-                # Hard stop at chunk end: if the read crossed end, we still got a full
-                # line that *belongs* to this chunk since chunk ends are newline-aligned.
-                # But guard anyway:
-                if pos_next > end and end != mm.size():
-                    # If end isn't EOF, we shouldn't have crossed it—trim and continue.
-                    line = line[:max(0, len(line) - (pos_next - end))]
-                s = line.strip()
-                if not s:
-                    pos = pos_next
-                    continue
-                # Fast filter: only parse if it could match
-                if target_bytes in s:
-                    try:
-                        rec = json.loads(s.decode("utf-8", errors="replace"))
-                    except json.JSONDecodeError:
-                        pos = pos_next
-                        continue
-                    rec_id = str(rec.get("book_id") or rec.get("id") or "")
-                    if rec_id == target_id:
-                        if not found_event.is_set():
-                            found_event.set()
-                            result_q.put(rec)
-                        return
-                pos = pos_next
-    except Exception as e:
-        if not found_event.is_set():
-            result_q.put({"__error__": f"Worker {start}-{end} exception: {e}"})
+        futures = [
+            executor.submit(scan_range, mm, locate, target_id, bounds[i], bounds[i + 1], found)
+            for i in range(len(bounds) - 1)
+        ]
+        for future in as_completed(futures):
+            rec = future.result()
+            if rec is not None:
+                found.set()
+                return rec
+        return None
+    finally:
+        found.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ---------- Offset index lookup ----------
+
+
+def lookup_offset(index_path: Path, target_id: str) -> Optional[Tuple[int, int]]:
+    """Return (offset, length) for `target_id` from the offset index, or None."""
+    if not target_id.isdigit():
+        return None
+    conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute(
+            "SELECT offset, length FROM idx WHERE book_id = ?", (int(target_id),)
+        ).fetchone()
+    finally:
+        conn.close()
+    return (row[0], row[1]) if row else None
+
+
+def record_at(mm: mmap.mmap, span: Tuple[int, int], target_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Decode the line at `span`, or None unless it is `target_id`'s record: an index
+    built against an older goodreads_books.json points at the wrong bytes.
+    """
+    offset, length = span
+    try:
+        rec = json_loads(mm[offset:offset + length])
+    except ValueError:
+        return None
+    if not isinstance(rec, dict) or rec.get("book_id") != target_id:
+        return None
+    return rec
 
 
 def main():
     ap = argparse.ArgumentParser(
-        description="Benchmark legacy multiprocessing lookup against the middle test entry."
+        description="Benchmark legacy JSONL lookup against the middle test entry."
     )
     ap.add_argument(
         "--json-path",
@@ -111,12 +237,17 @@ def main():
         default=MIDDLE_BOOK_ID,
         help="Goodreads book_id to search for (default: middle unit test entry).",
     )
+    ap.add_argument(
+        "--index-path",
+        default=DEFAULT_INDEX_PATH,
+        help="Offset index built by index_builder.py; falls back to a full scan if it is missing, lacks the id or is stale.",
+    )
     ap.add_argument(
         "-w",
         "--workers",
         type=int,
-        default=20,
-        help="Number of processes (default: 20)",
+        default=1,
+        help="Threads for the fallback scan (default: 1). They share one mmap.",
     )
     args = ap.parse_args()
 
@@ -127,45 +258,21 @@ def main():
 
     start_time = time.perf_counter()
 
+    index_path = Path(args.index_path)
+    scanner = "native" if _scan_lib is not None else "regex"
+    method = "offset index" if index_path.exists() else f"{scanner} mmap scan, {max(1, args.workers)} thread(s)"
+
     with open(args.json_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
-        bounds = line_chunk_boundaries(mm, args.workers)
-
-    # Spawn workers for each [start, end)
-    ctx = mp.get_context("fork" if sys.platform != "win32" else "spawn")
-    found_event = ctx.Event()
-    result_q = ctx.Queue(maxsize=1)
-
-    procs = []
-    for i in range(len(bounds) - 1):
-        start, end = bounds[i], bounds[i+1]
-        p = ctx.Process(target=worker_scan,
-                        args=(args.json_path, start, end,
-                              args.book_id, found_event, result_q),
-                        daemon=True)
-        p.start()
-        procs.append(p)
-
-    rec = None
-    # Wait until one returns a result or all exit
-    while rec is None and any(p.is_alive() for p in procs):
-        try:
-            msg = result_q.get(timeout=0.2)
-            if isinstance(msg, dict) and "__error__" in msg:
-                # Optional: print(msg["__error__"], file=sys.stderr)
-                pass
-            else:
-                rec = msg
-                found_event.set()
-                break
-        except Exception:
-            pass
-
-    # Stop everyone else
-    for p in procs:
-        if p.is_alive():
-            p.terminate()
-    for p in procs:
-        p.join(timeout=1.0)
+        rec = None
+        if index_path.exists():
+            hit = lookup_offset(index_path, args.book_id)
+            if hit:
+                rec = record_at(mm, hit, args.book_id)
+        if rec is None:
+            # No index, an id it does not cover, or a stale entry: scan instead.
+            if index_path.exists():
+                method = f"{scanner} mmap scan after offset index miss, {max(1, args.workers)} thread(s)"
+            rec = find_record(mm, args.book_id, args.workers)
 
     elapsed = time.perf_counter() - start_time
     if rec is None:
@@ -178,7 +285,7 @@ def main():
     title = rec.get("title") or rec.get("title_without_series") or "<unknown>"
     print(
         f"[MP_OLD] Found '{title}' (ID {args.book_id}) "
-        f"in {elapsed:.3f}s using {args.workers} processes."
+        f"in {elapsed:.3f}s ({method})."
     )
 
 
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Build the optional `_mp_scan` cffi extension used by MP_OLD.py.
+
+Usage:
+    uv run --with cffi python old/MP_TEST/build_scan.py
+
+MP_OLD.py falls back to its pure-Python regex scan if the extension is absent.
+"""
+
+from pathlib import Path
+
+from cffi import FFI
+
+HERE = Path(__file__).resolve().parent
+
+ffibuilder = FFI()
+ffibuilder.cdef(
+    """
+    long find_line_with(const char *buf, size_t len, size_t from,
+                        const char *needle, size_t nlen,
+                        size_t *line_start, size_t *line_end);
+    """
+)
+ffibuilder.set_source(
+    "_mp_scan",
+    (HERE / "scan.c").read_text(encoding="utf-8"),
+    extra_compile_args=["-O3"],
+)
+
+
+if __name__ == "__main__":
+    ffibuilder.compile(tmpdir=str(HERE), verbose=True)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+One-time utility to build a `book_id -> (offset, length)` index over goodreads_books.json.
+
+MP_OLD.py uses it to turn a full-file scan into a single primary-key lookup
+plus one slice of the mapped file.
+
+Usage:
+    uv run python old/MP_TEST/index_builder.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import mmap
+import re
+import sqlite3
+from pathlib import Path
+from typing import Iterator, Tuple
+
+DEFAULT_JSON_PATH = Path("datasets/goodreads_books.json")
+DEFAULT_INDEX_PATH = Path("datasets/goodreads_books_offsets.db")
+
+BOOK_ID_RE = re.compile(rb'"book_id":\s*"(\d+)"')
+
+
+def iter_offsets(mm: mmap.mmap) -> Iterator[Tuple[int, int, int]]:
+    """Yield (book_id, offset, length) for every line carrying a numeric book_id."""
+    size = mm.size()
+    pos = 0
+    while pos < size:
+        end = mm.find(b"\n", pos)
+        if end == -1:
+            end = size
+        match = BOOK_ID_RE.search(mm, pos, end)
+        if match:
+            yield int(match.group(1)), pos, end - pos
+        pos = end + 1
+
+
+def build_index(index_path: Path, json_path: Path, batch_size: int) -> int:
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA journal_mode = OFF;")
+    conn.execute("PRAGMA synchronous = OFF;")
+    conn.execute("DROP TABLE IF EXISTS idx;")
+    conn.execute(
+        "CREATE TABLE idx (book_id INTEGER PRIMARY KEY, offset INTEGER NOT NULL, length INTEGER NOT NULL);"
+    )
+
+    total = 0
+    batch = []
+    with open(json_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for row in iter_offsets(mm):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany("INSERT OR IGNORE INTO idx VALUES (?, ?, ?)", batch)
+                total += len(batch)
+                batch = []
+                print(f"Indexed {total} lines...", end="\r")
+        if batch:
+            conn.executemany("INSERT OR IGNORE INTO idx VALUES (?, ?, ?)", batch)
+            total += len(batch)
+
+    conn.commit()
+    conn.close()
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a book_id -> byte offset index for goodreads_books.json.")
+    parser.add_argument("--json-path", type=Path, default=DEFAULT_JSON_PATH, help="Path to goodreads_books.json (JSONL)")
+    parser.add_argument("--index-path", type=Path, default=DEFAULT_INDEX_PATH, help="Destination SQLite DB path")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Insert batch size")
+    args = parser.parse_args()
+
+    if not args.json_path.exists():
+        raise SystemExit(f"Books file not found: {args.json_path}")
+
+    total = build_index(args.index_path, args.json_path, args.batch_size)
+    print(f"\nDone! Indexed {total} lines into {args.index_path}.")
+
+
+if __name__ == "__main__":
+    main()
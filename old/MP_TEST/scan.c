@@ -0,0 +1,32 @@
+/*
+ * Native locate step for MP_OLD.py: find the first line at or after `from`
+ * that contains `needle`, using glibc memmem/memrchr/memchr.
+ *
+ * Returns the needle offset and writes the enclosing line span to
+ * *line_start / *line_end (end excludes the newline), or -1 if absent.
+ */
+#ifndef _GNU_SOURCE
+#define _GNU_SOURCE
+#endif
+#include <string.h>
+#include <sys/types.h>
+
+long find_line_with(const char *buf, size_t len, size_t from,
+                    const char *needle, size_t nlen,
+                    size_t *line_start, size_t *line_end)
+{
+    if (from >= len || nlen == 0)
+        return -1;
+
+    const char *hit = memmem(buf + from, len - from, needle, nlen);
+    if (hit == NULL)
+        return -1;
+
+    const char *nl = memrchr(buf, '\n', (size_t)(hit - buf));
+    *line_start = nl ? (size_t)(nl - buf) + 1 : 0;
+
+    nl = memchr(hit, '\n', len - (size_t)(hit - buf));
+    *line_end = nl ? (size_t)(nl - buf) : len;
+
+    return (long)(hit - buf);
+}
@@ -10,11 +10,14 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import json
+import importlib.util
+import multiprocessing
 import os
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from lib.extract_citations import (
     ExtractionConfig,
@@ -23,8 +26,10 @@ from lib.extract_citations import (
     write_output,
 )
 from preprocess_citations import preprocess as preprocess_citations
-from lib.bibliography_agent.agent import build_agent
+from lib.agent_cache import DEFAULT_CACHE_PATH, AgentResponseCache, prompt_key
+from lib.bibliography_agent.agent import SYSTEM_PROMPT, GoodreadsAgentRunner, build_agent
 from lib.bibliography_agent.test_agent import build_prompts
+from lib.json_utils import dumps as json_dumps, loads as json_loads, write_json
 
 try:
     from tqdm import tqdm  # type: ignore
@@ -32,6 +37,7 @@ except ImportError:  # pragma: no cover - optional dependency
     tqdm = None
 
 
+
 def progress_iter(iterable: Iterable[Path], **kwargs: object) -> Iterable[Path]:
     if tqdm is None:
         return iterable
@@ -46,12 +52,23 @@ EXTRACT_MAX_COMPLETION = 2048
 EXTRACT_MODEL_ID = "deepseek/deepseek-v3.2"
 
 AGENT_MODEL_ID = "deepseek/deepseek-v3.2"
+AGENT_BATCH_MAX_TOKENS = 512
+AGENT_HTTP_TIMEOUT = 120.0
 
 
 def find_txt_files(folder: Path, pattern: str = "*.txt") -> List[Path]:
     return sorted(p for p in folder.glob(pattern) if p.suffix.lower() == ".txt")
 
 
+def existing_names(folder: Path) -> Set[str]:
+    """File names already present in a stage's output folder (one directory read)."""
+    try:
+        with os.scandir(folder) as entries:
+            return {entry.name for entry in entries}
+    except FileNotFoundError:
+        return set()
+
+
 async def run_extraction(
     txt_path: Path,
     output_path: Path,
@@ -59,6 +76,7 @@ async def run_extraction(
     api_key: str,
     model_id: str,
     progress_callback: Optional[ProgressCallback] = None,
+    client: Optional["AsyncOpenAI"] = None,
 ) -> None:
     config = ExtractionConfig(
         input_path=txt_path,
@@ -71,73 +89,142 @@ async def run_extraction(
         model=model_id,
         tokenizer_name=model_id,
     )
-    result = await process_book(config, progress_callback=progress_callback)
+    result = await process_book(config, progress_callback=progress_callback, client=client)
     write_output(result, output_path)
 
 
-def stage_extract(
+async def extract_book(
+    txt: Path,
+    output_dir: Path,
+    base_url: str,
+    api_key: str,
+    model_id: str,
+    client: Optional["AsyncOpenAI"] = None,
+) -> None:
+    out_path = output_dir / f"{txt.stem}.json"
+    if out_path.exists():
+        print(f"[extract] Skip {txt.name} (cached).")
+        return
+    print(f"[extract] Processing {txt.name} -> {out_path}")
+    if tqdm is None:
+        await run_extraction(txt, out_path, base_url, api_key, model_id, client=client)
+        return
+    chunk_bar = tqdm(
+        desc=f"  chunks for {txt.name}",
+        unit="chunk",
+        leave=False,
+    )
+
+    def on_chunk_progress(done: int, total: int) -> None:
+        if chunk_bar.total != total:
+            chunk_bar.total = total
+        chunk_bar.n = done
+        chunk_bar.refresh()
+
+    try:
+        await run_extraction(
+            txt,
+            out_path,
+            base_url,
+            api_key,
+            model_id,
+            progress_callback=on_chunk_progress,
+            client=client,
+        )
+    finally:
+        chunk_bar.close()
+
+
+async def stage_extract(
     txt_files: Iterable[Path],
     output_dir: Path,
     base_url: str,
     api_key: str,
     model_id: str,
+    client: Optional["AsyncOpenAI"] = None,
 ) -> None:
     output_dir.mkdir(parents=True, exist_ok=True)
+    cached = existing_names(output_dir)
+    pending = [txt for txt in txt_files if f"{txt.stem}.json" not in cached]
+    if len(pending) < len(txt_files):
+        print(f"[extract] Skip {len(txt_files) - len(pending)} cached book(s).")
     iterator = progress_iter(
-        txt_files,
+        pending,
         desc="Stage 1/3: Extraction",
         unit="book",
     )
     for txt in iterator:
-        out_path = output_dir / f"{txt.stem}.json"
-        if out_path.exists():
-            print(f"[extract] Skip {txt.name} (cached).")
-            continue
-        print(f"[extract] Processing {txt.name} -> {out_path}")
-        if tqdm is None:
-            asyncio.run(run_extraction(txt, out_path, base_url, api_key, model_id))
-            continue
-        chunk_bar = tqdm(
-            desc=f"  chunks for {txt.name}",
-            unit="chunk",
-            leave=False,
-        )
+        await extract_book(txt, output_dir, base_url, api_key, model_id, client)
 
-        def on_chunk_progress(done: int, total: int) -> None:
-            if chunk_bar.total != total:
-                chunk_bar.total = total
-            chunk_bar.n = done
-            chunk_bar.refresh()
 
-        try:
-            asyncio.run(
-                run_extraction(
-                    txt,
-                    out_path,
-                    base_url,
-                    api_key,
-                    model_id,
-                    progress_callback=on_chunk_progress,
-                )
-            )
-        finally:
-            chunk_bar.close()
+def preprocess_book(txt: Path, raw_dir: Path, output_dir: Path) -> None:
+    raw_path = raw_dir / f"{txt.stem}.json"
+    pre_path = output_dir / f"{txt.stem}.json"
+    if pre_path.exists():
+        print(f"[preprocess] Skip {txt.name} (cached).")
+        return
+    if not raw_path.exists():
+        print(f"[preprocess] Missing raw JSON for {txt.name}, skipping.")
+        return
+    print(f"[preprocess] {raw_path} -> {pre_path}")
+    processed = preprocess_citations(raw_path)
+    write_json(pre_path, processed)
+
+
+def preprocess_pool() -> ProcessPoolExecutor:
+    """
+    Worker processes for preprocessing, started from a forkserver: forking a
+    parent that already runs an event loop, catalog threads and an HTTP pool
+    can deadlock the child on a lock some other thread held at fork time.
+    """
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("forkserver"))
 
 
 def stage_preprocess(raw_dir: Path, output_dir: Path, txt_files: Iterable[Path]) -> None:
+    """Preprocess every book; books are independent and CPU-bound, so fan out across processes."""
     output_dir.mkdir(parents=True, exist_ok=True)
-    for txt in txt_files:
-        raw_path = raw_dir / f"{txt.stem}.json"
-        pre_path = output_dir / f"{txt.stem}.json"
-        if pre_path.exists():
-            print(f"[preprocess] Skip {txt.name} (cached).")
-            continue
-        if not raw_path.exists():
-            print(f"[preprocess] Missing raw JSON for {txt.name}, skipping.")
-            continue
-        print(f"[preprocess] {raw_path} -> {pre_path}")
-        processed = preprocess_citations(raw_path)
-        pre_path.write_text(json.dumps(processed, indent=2, ensure_ascii=False))
+    cached = existing_names(output_dir)
+    txt_files = [txt for txt in txt_files if f"{txt.stem}.json" not in cached]
+    if not txt_files:
+        return
+    with preprocess_pool() as pool:
+        for _ in pool.map(
+            preprocess_book,
+            txt_files,
+            [raw_dir] * len(txt_files),
+            [output_dir] * len(txt_files),
+        ):
+            pass
+
+
+async def iter_paths(paths: Union[Iterable[Path], AsyncIterable[Path]]) -> AsyncIterator[Path]:
+    """Iterate a plain or async iterable of paths uniformly."""
+    if isinstance(paths, AsyncIterable):
+        async for path in paths:
+            yield path
+    else:
+        for path in paths:
+            yield path
+
+
+def build_http_client(max_workers: int) -> "httpx.AsyncClient":
+    """
+    One keep-alive connection pool for every agent request.
+
+    Uses HTTP/2 when the optional `h2` package is installed, so concurrent
+    citations multiplex over a single connection instead of each runner paying
+    its own TCP/TLS handshake.
+    """
+    import httpx
+
+    return httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_keepalive_connections=max_workers * 2,
+            max_connections=max_workers * 4,
+        ),
+        timeout=httpx.Timeout(AGENT_HTTP_TIMEOUT),
+    )
 
 
 def build_agent_runner(
@@ -146,6 +233,7 @@ def build_agent_runner(
     model_id: str,
     trace_tool: bool,
     wiki_people_path: str = "datasets/wiki_people_index.db",
+    http_client: Optional["httpx.AsyncClient"] = None,
 ) -> "GoodreadsAgentRunner":
     return build_agent(
         model=model_id,
@@ -156,18 +244,120 @@ def build_agent_runner(
         wiki_people_path=wiki_people_path,
         verbose=trace_tool,
         trace_tool=trace_tool,
+        async_http_client=http_client,
     )
 
 
+def resolve_tool_call(response: str, catalog: "SQLiteGoodreadsCatalog") -> str:
+    """Answer a bare `goodreads_book_lookup` tool call locally; pass anything else through."""
+    response_str = response.strip()
+    if not response_str.startswith("<tool_call>"):
+        return response
+    try:
+        tool_payload = json_loads(response_str.split(">", 1)[1].strip())
+        if tool_payload.get("name") == "goodreads_book_lookup":
+            args = tool_payload.get("arguments", {})
+            matches = catalog.find_books(
+                title=args.get("title"),
+                author=args.get("author"),
+                limit=5,
+            )
+            if matches:
+                return json_dumps({"result": "FOUND", "metadata": matches[0]}).decode()
+            return json_dumps({"result": "NOT_FOUND", "metadata": {}}).decode()
+    except Exception as exc:
+        print(f"[agent] Warning: failed to interpret tool call {response_str}: {exc}")
+    return response
+
+
+async def complete_prompts_batched(
+    client: "AsyncOpenAI",
+    model_id: str,
+    prompts: List[str],
+    batch_size: int,
+    max_tokens: int = AGENT_BATCH_MAX_TOKENS,
+) -> List[str]:
+    """
+    Send prompts to `/v1/completions` in groups of `batch_size`, one request per group.
+
+    The server batches each group into shared forward passes; `choice.index` maps
+    every completion back to its prompt. The chat API takes one conversation per
+    request, so the system prompt is sent as a text prefix instead; it is built
+    once and, together with the per-book header from `build_prompts`, forms a
+    byte-identical prefix that the server's prefix cache reuses across prompts.
+
+    Each completion gets the cleanup agent mode applies to its replies (fenced
+    or prose-wrapped JSON is salvaged, anything else becomes an UNPARSEABLE
+    payload), so no citation is dropped for its formatting alone.
+    """
+    prefix = f"{SYSTEM_PROMPT}\n\n"
+    outputs: List[str] = [""] * len(prompts)
+    for offset in range(0, len(prompts), batch_size):
+        group = prompts[offset:offset + batch_size]
+        completion = await client.completions.create(
+            model=model_id,
+            prompt=[f"{prefix}{prompt}\n" for prompt in group],
+            max_tokens=max_tokens,
+            temperature=0,
+        )
+        for choice in completion.choices:
+            outputs[offset + choice.index] = GoodreadsAgentRunner._normalize_response(choice.text or "")
+    return outputs
+
+
+def agent_record(citation: Dict[str, Any], response: str) -> Optional[bytes]:
+    """One JSONL line pairing `citation` with its parsed agent response; None if it is not JSON."""
+    try:
+        payload = json_loads(response)
+    except Exception as exc:
+        print(f"[agent] Warning: failed to parse response {response}: {exc}")
+        return None
+    return json_dumps({"citation": citation, "agent_response": payload}) + b"\n"
+
+
+def is_cacheable(response: str) -> bool:
+    """
+    Whether `response` is worth replaying on later runs: a non-empty JSON object
+    that is not the UNPARSEABLE fallback. Failures stay out of the cache so the
+    next run asks the LLM again instead of replaying them for every book.
+    """
+    try:
+        payload = json_loads(response)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and bool(payload) and payload.get("result") != "UNPARSEABLE"
+
+
+def stitch_records(partial_path: Path, spans: List[Optional[Tuple[int, int]]], final_path: Path) -> None:
+    """
+    Copy records out of the completion-ordered `partial_path` into `final_path` in
+    citation order, using the (offset, length) recorded for each one.
+
+    The result is written next to `final_path` and renamed into place, so an
+    interrupted run never leaves a truncated file that looks cached.
+    """
+    tmp_path = final_path.with_name(f"{final_path.name}.tmp")
+    with partial_path.open("rb") as src, tmp_path.open("wb") as out:
+        for span in spans:
+            if span is not None:
+                offset, length = span
+                src.seek(offset)
+                out.write(src.read(length))
+    tmp_path.replace(final_path)
+
+
 async def stage_agent_async(
     pre_dir: Path,
     output_dir: Path,
-    txt_files: Iterable[Path],
+    txt_files: Union[Iterable[Path], AsyncIterable[Path]],
     base_url: str,
     api_key: str,
     model_id: str,
     trace_tool: bool,
     agent_max_workers: int,
+    agent_batch_size: int = 0,
+    agent_cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
+    http_client: Optional["httpx.AsyncClient"] = None,
 ) -> None:
     from lib.goodreads_agent.goodreads_tool import SQLiteGoodreadsCatalog
 
@@ -175,78 +365,119 @@ async def stage_agent_async(
         raise ValueError("--agent-max-workers must be at least 1.")
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    runners = [build_agent_runner(base_url, api_key, model_id, trace_tool) for _ in range(agent_max_workers)]
-    runner_queue: asyncio.Queue["GoodreadsAgentRunner"] = asyncio.Queue()
-    for runner in runners:
-        runner_queue.put_nowait(runner)
-
-    # Create one catalog per worker to avoid SQLite thread-safety issues
-    catalogs = [SQLiteGoodreadsCatalog(trace=trace_tool) for _ in range(agent_max_workers)]
-    catalog_queue: asyncio.Queue[SQLiteGoodreadsCatalog] = asyncio.Queue()
-    for catalog in catalogs:
-        catalog_queue.put_nowait(catalog)
-    iterator = progress_iter(
-        txt_files,
-        desc="Stage 3/3: Goodreads agent",
-        unit="book",
-    )
+    if isinstance(txt_files, (list, tuple)):
+        # Known up front: skip cached books before building runners/catalogs.
+        cached = existing_names(output_dir)
+        txt_files = [txt for txt in txt_files if f"{txt.stem}.jsonl" not in cached]
+        if not txt_files:
+            return
+    # Every runner (or the batch client) shares one connection pool.
+    owns_http_client = http_client is None
+    if http_client is None:
+        http_client = build_http_client(agent_max_workers)
+    batch_client: Optional["AsyncOpenAI"] = None
+    # Catalog lookups block on SQLite, so tool calls are resolved off the event
+    # loop. sqlite3 connections are bound to their creating thread, so each
+    # worker thread lazily opens (and then keeps) its own catalog.
+    thread_state = threading.local()
+
+    def resolve_on_thread(responses: List[str]) -> List[str]:
+        catalog = getattr(thread_state, "catalog", None)
+        if catalog is None:
+            catalog = thread_state.catalog = SQLiteGoodreadsCatalog(trace=trace_tool)
+        return [resolve_tool_call(response, catalog) for response in responses]
+
+    # Recurring citations build identical prompts; only the first occurrence
+    # (within a book or across the library) reaches the LLM.
+    response_cache = AgentResponseCache(agent_cache_path) if agent_cache_path is not None else None
+    free_runners: List["GoodreadsAgentRunner"] = []
+    if agent_batch_size > 0:
+        # Batched mode: plain completions, no agent runners; tool calls are
+        # resolved against a catalog after the fact.
+        from openai import AsyncOpenAI
+
+        batch_client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+    # Gates task *creation*, so at most agent_max_workers citation tasks exist
+    # at once. Runners are built on demand and then reused, so the pool only
+    # grows to the concurrency actually reached (none for fully cached or
+    # citation-less books, at most agent_max_workers).
+    worker_slots = asyncio.Semaphore(agent_max_workers)
+    book_bar = None
+    if tqdm is not None:
+        book_bar = tqdm(
+            total=len(txt_files) if isinstance(txt_files, (list, tuple)) else None,
+            desc="Stage 3/3: Goodreads agent",
+            unit="book",
+        )
 
-    async def process_single_citation(
+    def finish_citation(
         idx: int,
         citation: Dict[str, Any],
-        prompt: str,
-    ) -> tuple[int, Optional[str]]:
-        runner = await runner_queue.get()
-        catalog = await catalog_queue.get()
-        try:
-            start = time.perf_counter()
-            response = await runner.query(prompt)
-        finally:
-            runner_queue.put_nowait(runner)
-
-        try:
-            response_str = response.strip()
-            if response_str.startswith("<tool_call>"):
-                try:
-                    tool_payload = json.loads(response_str.split(">", 1)[1].strip())
-                    if tool_payload.get("name") == "goodreads_book_lookup":
-                        args = tool_payload.get("arguments", {})
-                        matches = catalog.find_books(
-                            title=args.get("title"),
-                            author=args.get("author"),
-                            limit=5,
-                        )
-                        if matches:
-                            response = json.dumps(
-                                {"result": "FOUND", "metadata": matches[0]},
-                                ensure_ascii=False,
-                            )
-                        else:
-                            response = json.dumps(
-                                {"result": "NOT_FOUND", "metadata": {}},
-                                ensure_ascii=False,
-                            )
-                except Exception as exc:
-                    print(f"[agent] Warning: failed to interpret tool call {response_str}: {exc}")
-        finally:
-            catalog_queue.put_nowait(catalog)
-
-        elapsed = time.perf_counter() - start
+        response: str,
+        elapsed: float,
+    ) -> tuple[int, Optional[bytes]]:
         if trace_tool:
             title = citation.get("title") or citation.get("author") or "unknown citation"
             preview = response[:120] + ("..." if len(response) > 120 else "")
             print(f"[agent] Completed '{title}' in {elapsed:.3f}s -> {preview}")
-
+        return idx, agent_record(citation, response)
+
+    async def process_single_citation(key: bytes, prompt: str) -> str:
+        """Resolved agent response for `prompt`, from the cache when it has been seen before."""
+        if response_cache is not None:
+            cached_response = response_cache.get(key)
+            # Caches written before failures were kept out may still hold some.
+            if cached_response is not None and is_cacheable(cached_response):
+                return cached_response
+
+        if free_runners:
+            runner = free_runners.pop()
+        else:
+            runner = build_agent_runner(base_url, api_key, model_id, trace_tool, http_client=http_client)
         try:
-            payload = json.loads(response)
-        except Exception as exc:
-            print(f"[agent] Warning: failed to parse response {response}: {exc}")
-            return idx, None
-
-        record = {"citation": citation, "agent_response": payload}
-        return idx, json.dumps(record, ensure_ascii=False)
-
-    for txt in iterator:
+            response = await runner.query(prompt)
+        finally:
+            free_runners.append(runner)
+
+        (response,) = await asyncio.to_thread(resolve_on_thread, [response])
+        if response_cache is not None and is_cacheable(response):
+            response_cache.put(key, response)
+        return response
+
+    async def process_citations_batched(
+        citations: List[Dict[str, Any]],
+        prompts: List[str],
+    ) -> List[tuple[int, Optional[bytes]]]:
+        start = time.perf_counter()
+        keys = [prompt_key(prompt, model_id) for prompt in prompts]
+        responses: Dict[bytes, str] = {}
+        misses: Dict[bytes, str] = {}
+        for key, prompt in zip(keys, prompts):
+            if key in responses or key in misses:
+                continue
+            cached_response = response_cache.get(key) if response_cache is not None else None
+            if cached_response is not None and is_cacheable(cached_response):
+                responses[key] = cached_response
+            else:
+                misses[key] = prompt
+
+        completions = await complete_prompts_batched(batch_client, model_id, list(misses.values()), agent_batch_size)
+        # The whole group's tool calls go to one worker thread in a single hop.
+        resolved = await asyncio.to_thread(resolve_on_thread, completions)
+        for key, response in zip(misses, resolved):
+            responses[key] = response
+            if response_cache is not None and is_cacheable(response):
+                response_cache.put(key, response)
+
+        elapsed = (time.perf_counter() - start) / max(1, len(prompts))
+        return [
+            finish_citation(idx, citation, responses[key], elapsed)
+            for idx, (citation, key) in enumerate(zip(citations, keys))
+        ]
+
+    async for txt in iter_paths(txt_files):
+        if book_bar is not None:
+            book_bar.update(1)
         pre_path = pre_dir / f"{txt.stem}.json"
         final_path = output_dir / f"{txt.stem}.jsonl"
         if final_path.exists():
@@ -256,19 +487,20 @@ async def stage_agent_async(
             print(f"[agent] Missing preprocessed JSON for {txt.name}, skipping.")
             continue
 
-        data = json.loads(pre_path.read_text())
+        data = json_loads(pre_path.read_bytes())
         citations = data.get("citations", [])
+        print(f"[agent] Processing {len(citations)} citations for {txt.name}")
+
+        if not citations:
+            final_path.write_text("")
+            continue
+
         prompts = build_prompts(
             citations,
             source_title=txt.stem,
             source_authors=[],
             source_description=None,
         )
-        print(f"[agent] Processing {len(citations)} citations for {txt.name}")
-
-        if not citations:
-            final_path.write_text("")
-            continue
 
         citation_bar = None
         if tqdm is not None:
@@ -279,26 +511,64 @@ async def stage_agent_async(
                 leave=False,
             )
 
+        # Records are appended to a per-book partial file as they complete, so
+        # only their (offset, length) is held in memory until the final stitch.
+        partial_path = final_path.with_name(f"{final_path.name}.partial")
+        spans: List[Optional[Tuple[int, int]]] = [None] * len(citations)
         try:
-            tasks = [
-                asyncio.create_task(process_single_citation(idx, citation, prompt))
-                for idx, (citation, prompt) in enumerate(zip(citations, prompts))
-            ]
-            results: List[Optional[str]] = [None] * len(tasks)
-            for task in asyncio.as_completed(tasks):
-                idx, record_line = await task
-                if record_line is not None:
-                    results[idx] = record_line
-                if citation_bar is not None:
-                    citation_bar.update(1)
-            with final_path.open("w", encoding="utf-8") as out:
-                for record_line in results:
-                    if record_line is not None:
-                        out.write(record_line + "\n")
+            with partial_path.open("wb") as partial:
+
+                def emit(idx: int, record: Optional[bytes]) -> None:
+                    if record is not None:
+                        spans[idx] = (partial.tell(), len(record))
+                        partial.write(record)
+
+                if batch_client is not None:
+                    for idx, record in await process_citations_batched(citations, prompts):
+                        emit(idx, record)
+                    if citation_bar is not None:
+                        citation_bar.update(len(citations))
+                else:
+                    # One task per distinct prompt; its response fans out to every
+                    # citation in the book that built the same prompt.
+                    occurrences: Dict[bytes, List[int]] = {}
+                    unique_prompts: Dict[bytes, str] = {}
+                    for idx, prompt in enumerate(prompts):
+                        key = prompt_key(prompt, model_id)
+                        occurrences.setdefault(key, []).append(idx)
+                        unique_prompts.setdefault(key, prompt)
+
+                    async def run_citation(key: bytes, prompt: str) -> None:
+                        try:
+                            start = time.perf_counter()
+                            response = await process_single_citation(key, prompt)
+                            elapsed = time.perf_counter() - start
+                            for idx in occurrences[key]:
+                                emit(*finish_citation(idx, citations[idx], response, elapsed))
+                            if citation_bar is not None:
+                                citation_bar.update(len(occurrences[key]))
+                        finally:
+                            worker_slots.release()
+
+                    async with asyncio.TaskGroup() as tg:
+                        for key, prompt in unique_prompts.items():
+                            await worker_slots.acquire()
+                            tg.create_task(run_citation(key, prompt))
+            stitch_records(partial_path, spans, final_path)
         finally:
+            partial_path.unlink(missing_ok=True)
             if citation_bar is not None:
                 citation_bar.close()
 
+    if book_bar is not None:
+        book_bar.close()
+    if batch_client is not None:
+        await batch_client.close()
+    if response_cache is not None:
+        response_cache.close()
+    if owns_http_client:
+        await http_client.aclose()
+
 
 def stage_agent(
     pre_dir: Path,
@@ -309,6 +579,8 @@ def stage_agent(
     model_id: str,
     trace_tool: bool,
     agent_max_workers: int,
+    agent_batch_size: int = 0,
+    agent_cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
 ) -> None:
     asyncio.run(
         stage_agent_async(
@@ -320,10 +592,94 @@ def stage_agent(
             model_id,
             trace_tool,
             agent_max_workers,
+            agent_batch_size,
+            agent_cache_path,
         )
     )
 
 
+async def run_pipeline(args: argparse.Namespace, txt_files: List[Path]) -> None:
+    """
+    Drive all three stages on one event loop.
+
+    The extraction client is opened once and reused for every book, and the
+    agent runners/catalogs are built once inside `stage_agent_async`. Books are
+    handed to the agent stage as soon as they are extracted and preprocessed, so
+    extraction of book N+1 overlaps the agent pass over book N.
+    """
+    from openai import AsyncOpenAI
+
+    raw_dir = args.input_dir / "raw_extracted_citations"
+    pre_dir = args.input_dir / "preprocessed_extracted_citations"
+    final_dir = args.input_dir / "final_citations_metadata_goodreads"
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    pre_dir.mkdir(parents=True, exist_ok=True)
+
+    # Drop finished books before any client, pool or agent runner is built.
+    final_cached = existing_names(final_dir)
+    pending = [txt for txt in txt_files if f"{txt.stem}.jsonl" not in final_cached]
+    if len(pending) < len(txt_files):
+        print(f"[agent] Skip {len(txt_files) - len(pending)} cached book(s).")
+    if not pending:
+        return
+    pre_cached = existing_names(pre_dir)
+
+    ready: asyncio.Queue[Optional[Path]] = asyncio.Queue()
+
+    async def extract_and_preprocess() -> None:
+        loop = asyncio.get_running_loop()
+        preprocessing: List[asyncio.Task[None]] = []
+
+        async def preprocess_then_queue(pool: ProcessPoolExecutor, txt: Path) -> None:
+            # CPU-bound: run in a worker process so the loop keeps extracting.
+            await loop.run_in_executor(pool, preprocess_book, txt, raw_dir, pre_dir)
+            ready.put_nowait(txt)
+
+        pool = preprocess_pool()
+        try:
+            async with AsyncOpenAI(api_key=args.extract_api_key, base_url=args.extract_base_url) as client:
+                iterator = progress_iter(
+                    pending,
+                    desc="Stages 1-2/3: Extraction + preprocessing",
+                    unit="book",
+                )
+                for txt in iterator:
+                    if f"{txt.stem}.json" in pre_cached:
+                        ready.put_nowait(txt)
+                        continue
+                    await extract_book(
+                        txt, raw_dir, args.extract_base_url, args.extract_api_key, args.extract_model, client
+                    )
+                    preprocessing.append(asyncio.create_task(preprocess_then_queue(pool, txt)))
+            await asyncio.gather(*preprocessing)
+        finally:
+            # shutdown() joins the workers; keep the event loop free meanwhile.
+            await asyncio.to_thread(pool.shutdown, cancel_futures=True)
+            ready.put_nowait(None)
+
+    async def ready_books() -> AsyncIterator[Path]:
+        while (txt := await ready.get()) is not None:
+            yield txt
+
+    async with build_http_client(args.agent_max_workers) as http_client, asyncio.TaskGroup() as tg:
+        tg.create_task(extract_and_preprocess())
+        tg.create_task(
+            stage_agent_async(
+                pre_dir,
+                final_dir,
+                ready_books(),
+                args.agent_base_url,
+                args.agent_api_key,
+                args.agent_model,
+                args.agent_trace,
+                args.agent_max_workers,
+                args.agent_batch_size,
+                None if args.no_agent_cache else args.agent_cache_path,
+                http_client,
+            )
+        )
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Full citation processing pipeline.")
     parser.add_argument("input_dir", type=Path, help="Directory containing .txt files.")
@@ -368,6 +724,26 @@ def parse_args() -> argparse.Namespace:
         default=5,
         help="Maximum concurrent Goodreads agent calls (default: 5).",
     )
+    parser.add_argument(
+        "--agent-batch-size",
+        type=int,
+        default=0,
+        help=(
+            "Send citation prompts to /v1/completions in batches of this size instead of "
+            "running one agent query per citation (default: 0, agent mode)."
+        ),
+    )
+    parser.add_argument(
+        "--agent-cache-path",
+        type=Path,
+        default=DEFAULT_CACHE_PATH,
+        help=f"SQLite cache of agent responses keyed by prompt (default: {DEFAULT_CACHE_PATH}).",
+    )
+    parser.add_argument(
+        "--no-agent-cache",
+        action="store_true",
+        help="Query the LLM for every citation, bypassing the agent response cache.",
+    )
     parser.add_argument(
         "--agent-trace",
         action="store_true",
@@ -385,22 +761,7 @@ def main() -> None:
         print("No .txt files found; nothing to do.")
         return
 
-    raw_dir = args.input_dir / "raw_extracted_citations"
-    pre_dir = args.input_dir / "preprocessed_extracted_citations"
-    final_dir = args.input_dir / "final_citations_metadata_goodreads"
-
-    stage_extract(txt_files, raw_dir, args.extract_base_url, args.extract_api_key, args.extract_model)
-    stage_preprocess(raw_dir, pre_dir, txt_files)
-    stage_agent(
-        pre_dir,
-        final_dir,
-        txt_files,
-        args.agent_base_url,
-        args.agent_api_key,
-        args.agent_model,
-        args.agent_trace,
-        args.agent_max_workers,
-    )
+    asyncio.run(run_pipeline(args, txt_files))
 
     print("Pipeline complete.")
 
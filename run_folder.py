@@ -125,7 +125,10 @@ def parse_args() -> argparse.Namespace:
         "--workers",
         type=int,
         default=1,
-        help="Number of files to process in parallel (be careful with API limits).",
+        help=(
+            "Number of files to process in parallel. They share the --agent-concurrency "
+            "and --extract-concurrency limits, so this only sets how many books overlap."
+        ),
     )
     parser.add_argument(
         "--agent-concurrency",
@@ -149,6 +152,11 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Validate config and show what would be processed without running.",
     )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the final citations JSON (compact by default).",
+    )
     parser.add_argument(
         "--force-llm-queries",
         action="store_true",
@@ -290,6 +298,7 @@ async def run(args: argparse.Namespace):
 
         debug_trace=args.verbose,
         force_llm_queries=args.force_llm_queries,
+        pretty_output=args.pretty,
     )
 
     pipeline = BookPipeline(config)
@@ -311,7 +320,10 @@ async def run(args: argparse.Namespace):
         async with sem:
             await process_file(pipeline, fpath, output_dir)
 
-    await asyncio.gather(*(worker(f) for f in files))
+    try:
+        await asyncio.gather(*(worker(f) for f in files))
+    finally:
+        await pipeline.aclose()
 
     logger.info("All done.")
     print("All done.")
@@ -99,6 +99,11 @@ def parse_args() -> argparse.Namespace:
         default=20,
         help="Max concurrent extraction requests (default: 20).",
     )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the final citations JSON (compact by default).",
+    )
     parser.add_argument(
         "--force-llm-queries",
         action="store_true",
@@ -148,6 +153,7 @@ async def run(args: argparse.Namespace):
         
         debug_trace=True,
         force_llm_queries=args.force_llm_queries,
+        pretty_output=args.pretty,
     )
     
     pipeline = BookPipeline(config)
@@ -176,6 +182,8 @@ async def run(args: argparse.Namespace):
         print(f"Error processing file: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        await pipeline.aclose()
 
 def main() -> None:
     args = parse_args()
@@ -35,6 +35,24 @@ def load_authors(authors_path: Path) -> Dict[str, str]:
     return mapping
 
 
+def source_stamp(books_path: Path) -> str:
+    stat = books_path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def index_is_current(db_path: Path, books_path: Path) -> bool:
+    """True if `db_path` was built from the current version of `books_path`."""
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM index_meta WHERE key = 'source_stamp'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return bool(row) and row[0] == source_stamp(books_path)
+
+
 def chunks(iterable: Iterable[dict], size: int) -> Iterable[List[dict]]:
     batch: List[dict] = []
     for item in iterable:
@@ -55,6 +73,7 @@ def build_index(db_path: Path, books_path: Path, authors: Dict[str, str], batch_
     cur = conn.cursor()
     cur.execute("DROP TABLE IF EXISTS books_fts;")
     cur.execute("DROP TABLE IF EXISTS books;")
+    cur.execute("DROP TABLE IF EXISTS index_meta;")
     
     # FTS table for text search
     cur.execute(
@@ -68,13 +87,14 @@ def build_index(db_path: Path, books_path: Path, authors: Dict[str, str], batch_
         """
     )
     
-    # Standard table for ID lookup
+    # Standard table for ID lookup. WITHOUT ROWID clusters rows on book_id, so
+    # a point lookup is one B-tree descent instead of autoindex + rowid table.
     cur.execute(
         """
         CREATE TABLE books (
             book_id TEXT PRIMARY KEY,
             data TEXT
-        );
+        ) WITHOUT ROWID;
         """
     )
 
@@ -136,6 +156,8 @@ def build_index(db_path: Path, books_path: Path, authors: Dict[str, str], batch_
             print(f"Indexed {total} books...", end="\r")
 
     cur.execute("INSERT INTO books_fts(books_fts) VALUES('optimize');")
+    cur.execute("CREATE TABLE index_meta (key TEXT PRIMARY KEY, value TEXT);")
+    cur.execute("INSERT INTO index_meta VALUES ('source_stamp', ?);", (source_stamp(books_path),))
     conn.commit()
     conn.close()
     print(f"\nDone! Indexed {total} books into {db_path}.")
@@ -147,7 +169,7 @@ def main() -> None:
     parser.add_argument("--authors-json", type=Path, default=AUTHORS_JSON, help="Path to goodreads_book_authors.json")
     parser.add_argument("--db-path", type=Path, default=DEFAULT_DB, help="Destination SQLite DB path")
     parser.add_argument("--batch-size", type=int, default=5000, help="Insert batch size")
-    parser.add_argument("--force", action="store_true", help="Overwrite existing DB if present")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the DB matches the source file")
     args = parser.parse_args()
 
     if not args.books_json.exists():
@@ -155,9 +177,10 @@ def main() -> None:
     if not args.authors_json.exists():
         raise SystemExit(f"Authors file not found: {args.authors_json}")
     if args.db_path.exists():
-        if not args.force:
-            print(f"{args.db_path} already exists. Use --force to rebuild.")
+        if not args.force and index_is_current(args.db_path, args.books_json):
+            print(f"{args.db_path} is up to date with {args.books_json}. Use --force to rebuild.")
             return
+        print(f"Rebuilding {args.db_path} (forced, or {args.books_json} changed since last build).")
         args.db_path.unlink()
 
     print("Loading authors...")
@@ -0,0 +1,57 @@
+"""Unit tests for the AIMD adaptive semaphore."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lib.adaptive_semaphore import AdaptiveSemaphore
+
+
+def _run_batch(sem: AdaptiveSemaphore, n: int) -> int:
+    """Run n tasks through `sem`, returning the peak concurrency seen."""
+    live = peak = 0
+
+    async def task():
+        nonlocal live, peak
+        async with sem:
+            live += 1
+            peak = max(peak, live)
+            await asyncio.sleep(0)
+            live -= 1
+
+    async def main():
+        await asyncio.gather(*(task() for _ in range(n)))
+
+    asyncio.run(main())
+    return peak
+
+
+class TestAdaptiveSemaphore:
+    def test_limit_bounds_concurrency(self):
+        sem = AdaptiveSemaphore(3, maximum=3, window=1000)
+        assert _run_batch(sem, 20) == 3
+        assert sem._in_flight == 0 and not sem._waiters
+
+    def test_initial_limit_is_clamped(self):
+        assert AdaptiveSemaphore(50, maximum=8).limit == 8
+        assert AdaptiveSemaphore(0, maximum=8).limit == 1
+
+    def test_throughput_gain_adds_a_permit(self):
+        sem = AdaptiveSemaphore(2, maximum=10, window=5)
+        sem._last_rate = 1.0
+        sem._window_start -= 1.0
+        for _ in range(5):
+            sem._record_completion()
+        assert sem.limit == 3
+
+    def test_throughput_loss_cuts_the_limit(self):
+        sem = AdaptiveSemaphore(8, maximum=10, window=5)
+        sem._last_rate = 1000.0
+        sem._window_start -= 1.0
+        for _ in range(5):
+            sem._record_completion()
+        assert sem.limit == 6
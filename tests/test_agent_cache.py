@@ -0,0 +1,40 @@
+"""Unit tests for the agent response cache."""
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from lib.agent_cache import AgentResponseCache, prompt_key
+
+
+class TestPromptKey:
+    def test_identical_prompts_share_a_key(self):
+        assert prompt_key("Plato, Republic", "m") == prompt_key("Plato, Republic", "m")
+        assert len(prompt_key("Plato, Republic")) == 16
+
+    def test_model_is_part_of_the_key(self):
+        assert prompt_key("Plato, Republic", "a") != prompt_key("Plato, Republic", "b")
+
+
+class TestAgentResponseCache:
+    def test_round_trip_persists(self, tmp_path):
+        key = prompt_key("Plato, Republic")
+        cache = AgentResponseCache(tmp_path / "cache.db")
+        assert cache.get(key) is None
+        cache.put(key, '{"result": "FOUND", "title": "Πολιτεία"}')
+        cache.close()
+
+        reopened = AgentResponseCache(tmp_path / "cache.db")
+        assert reopened.get(key) == '{"result": "FOUND", "title": "Πολιτεία"}'
+        reopened.close()
+
+    def test_first_response_wins(self, tmp_path):
+        key = prompt_key("Plato, Republic")
+        cache = AgentResponseCache(tmp_path / "cache.db")
+        cache.put(key, "first")
+        cache.put(key, "second")
+        assert cache.get(key) == "first"
+        cache.close()
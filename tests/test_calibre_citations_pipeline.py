@@ -0,0 +1,229 @@
+"""Unit tests for the Calibre pipeline helpers."""
+
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import calibre_citations_pipeline
+from calibre_citations_pipeline import (
+    AdmissionController,
+    _install_resize_signals,
+    _listed_rows,
+    completed_book_ids,
+    load_calibre_books,
+    load_goodreads_metadata,
+    load_goodreads_metadata_cached,
+)
+
+
+def _make_books_db(path: Path) -> Path:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE books (book_id TEXT PRIMARY KEY, data TEXT, original_publication_year INTEGER)")
+    rows = [
+        ("4900", {"book_id": "4900", "title": "Heart of Darkness", "author_names_resolved": ["Joseph Conrad"]}, 1899),
+        ("1", {"book_id": "1", "title": "Lord Jim", "authors": json.dumps([{"author_id": "1"}])}, None),
+    ]
+    conn.executemany(
+        "INSERT INTO books VALUES (?, ?, ?)",
+        [(book_id, json.dumps(data), year) for book_id, data, year in rows],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _make_calibre_library(root: Path) -> Path:
+    """Minimal Calibre library: one eligible TXT book, one EPUB-only book, one without a Goodreads id."""
+    conn = sqlite3.connect(root / "metadata.db")
+    conn.executescript(
+        """
+        CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT, author_sort TEXT, path TEXT);
+        CREATE TABLE identifiers (id INTEGER PRIMARY KEY, book INTEGER, type TEXT, val TEXT, UNIQUE(book, type));
+        CREATE TABLE data (id INTEGER PRIMARY KEY, book INTEGER, format TEXT, name TEXT, UNIQUE(book, format));
+        CREATE TABLE comments (id INTEGER PRIMARY KEY, book INTEGER, text TEXT, UNIQUE(book));
+        INSERT INTO books VALUES (1, 'Heart of Darkness', 'Conrad, Joseph', 'Conrad/HoD');
+        INSERT INTO books VALUES (2, 'Lord Jim', 'Conrad, Joseph', 'Conrad/LJ');
+        INSERT INTO books VALUES (3, 'Nostromo', 'Conrad, Joseph', 'Conrad/N');
+        INSERT INTO identifiers (book, type, val) VALUES (1, 'goodreads', '4900'), (2, 'goodreads', '1'), (3, 'isbn', 'x');
+        INSERT INTO data (book, format, name) VALUES
+            (1, 'EPUB', 'hod'), (1, 'TXT', 'hod'), (1, 'MOBI', 'hod'), (2, 'EPUB', 'lj'), (3, 'TXT', 'n');
+        INSERT INTO comments (book, text) VALUES (1, '  A river journey.  ');
+        """
+    )
+    conn.commit()
+    conn.close()
+    for rel, name in (("Conrad/HoD", "hod"), ("Conrad/N", "n")):
+        (root / rel).mkdir(parents=True)
+        (root / rel / f"{name}.txt").write_text("text")
+    return root
+
+
+class TestLoadCalibreBooks:
+    def test_one_row_per_txt_book_with_goodreads_id(self, tmp_path):
+        books = load_calibre_books(_make_calibre_library(tmp_path))
+        assert [b.goodreads_id for b in books] == ["4900"]
+        assert books[0].txt_path == tmp_path / "Conrad/HoD/hod.txt"
+        assert books[0].description == "A river journey."
+
+    def test_epub_detected_only_when_present(self, tmp_path):
+        library = _make_calibre_library(tmp_path)
+        assert load_calibre_books(library)[0].epub_path is None
+        (library / "Conrad/HoD/hod.epub").write_bytes(b"")
+        assert load_calibre_books(library)[0].epub_path == library / "Conrad/HoD/hod.epub"
+
+    def test_missing_txt_file_is_skipped(self, tmp_path):
+        library = _make_calibre_library(tmp_path)
+        (library / "Conrad/HoD/hod.txt").unlink()
+        assert load_calibre_books(library) == []
+
+    def test_allowed_ids_filter(self, tmp_path):
+        library = _make_calibre_library(tmp_path)
+        assert load_calibre_books(library, {"1"}) == []
+        assert [b.goodreads_id for b in load_calibre_books(library, {"4900"})] == ["4900"]
+
+
+class TestListedRows:
+    def test_rows_keep_cursor_order_with_their_listings(self, tmp_path):
+        for name in ("a", "b", "c"):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / f"{name}.txt").write_text("")
+        rows = [{"path": name} for name in ("c", "a", "missing", "b")]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            listed = list(_listed_rows(rows, str(tmp_path), pool, window=2))
+        assert [(row["path"], entries) for row, entries in listed] == [
+            ("c", {"c.txt"}), ("a", {"a.txt"}), ("missing", set()), ("b", {"b.txt"}),
+        ]
+
+    def test_rows_are_pulled_only_a_window_ahead(self, tmp_path):
+        pulled = []
+
+        def rows():
+            for i in range(10):
+                pulled.append(i)
+                yield {"path": str(i)}
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            listed = _listed_rows(rows(), str(tmp_path), pool, window=3)
+            next(listed)
+            assert len(pulled) == 3
+            next(listed)
+            assert len(pulled) == 4
+            assert len(list(listed)) == 8
+
+
+class TestLoadGoodreadsMetadata:
+    def test_decodes_data_payload(self, tmp_path):
+        db = _make_books_db(tmp_path / "books.db")
+        meta = load_goodreads_metadata({"4900"}, str(db))
+        assert meta["4900"]["title"] == "Heart of Darkness"
+        assert meta["4900"]["author_names_resolved"] == ["Joseph Conrad"]
+
+    def test_merges_extra_columns(self, tmp_path):
+        db = _make_books_db(tmp_path / "books.db")
+        meta = load_goodreads_metadata({"4900"}, str(db))
+        assert meta["4900"]["original_publication_year"] == 1899
+
+    def test_decodes_string_authors(self, tmp_path):
+        db = _make_books_db(tmp_path / "books.db")
+        meta = load_goodreads_metadata({"1"}, str(db))
+        assert meta["1"]["authors"] == [{"author_id": "1"}]
+
+    def test_unknown_ids_are_absent(self, tmp_path):
+        db = _make_books_db(tmp_path / "books.db")
+        assert set(load_goodreads_metadata({"4900", "999"}, str(db))) == {"4900"}
+
+    def test_id_sets_beyond_the_parameter_limit(self, tmp_path):
+        db = _make_books_db(tmp_path / "books.db")
+        ids = {str(n) for n in range(5000, 40000)} | {"4900", "1"}
+        assert set(load_goodreads_metadata(ids, str(db))) == {"4900", "1"}
+
+    def test_missing_db_returns_empty(self, tmp_path):
+        assert load_goodreads_metadata({"4900"}, str(tmp_path / "nope.db")) == {}
+
+
+class TestLoadGoodreadsMetadataCached:
+    def test_warm_run_skips_the_index(self, tmp_path, monkeypatch):
+        db = _make_books_db(tmp_path / "books.db")
+        cache = tmp_path / "out" / "meta.json"
+        cold = load_goodreads_metadata_cached({"4900"}, str(db), cache)
+        assert cold["4900"]["title"] == "Heart of Darkness"
+
+        def fail(*args):
+            raise AssertionError("index queried on a warm run")
+
+        monkeypatch.setattr(calibre_citations_pipeline, "load_goodreads_metadata", fail)
+        assert load_goodreads_metadata_cached({"4900"}, str(db), cache) == cold
+
+    def test_changed_id_set_misses(self, tmp_path):
+        db = _make_books_db(tmp_path / "books.db")
+        cache = tmp_path / "meta.json"
+        load_goodreads_metadata_cached({"4900"}, str(db), cache)
+        assert set(load_goodreads_metadata_cached({"4900", "1"}, str(db), cache)) == {"4900", "1"}
+
+
+class TestCompletedBookIds:
+    def test_only_final_outputs_count(self, tmp_path):
+        final_dir = tmp_path / "final_citations_metadata_goodreads"
+        final_dir.mkdir()
+        (final_dir / "4900.json").write_text("{}")
+        (final_dir / "1.partial.jsonl").write_text("")
+        assert completed_book_ids(tmp_path) == {"4900"}
+
+    def test_fresh_output_dir(self, tmp_path):
+        assert completed_book_ids(tmp_path / "nope") == set()
+
+
+class TestAdmissionController:
+    def test_limit_changes_apply_to_waiting_books(self):
+        async def main():
+            admission = AdmissionController(1)
+            live = peak = 0
+            gate = asyncio.Event()
+
+            async def book():
+                nonlocal live, peak
+                async with admission:
+                    live += 1
+                    peak = max(peak, live)
+                    await gate.wait()
+                    live -= 1
+
+            tasks = [asyncio.create_task(book()) for _ in range(4)]
+            await asyncio.sleep(0)
+            assert live == 1
+            await admission.set_limit(3)
+            await asyncio.sleep(0)
+            assert live == 3
+            await admission.set_limit(0)
+            assert admission.limit == 1
+            gate.set()
+            await asyncio.gather(*tasks)
+            return peak
+
+        assert asyncio.run(main()) == 3
+
+    @pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="POSIX signals only")
+    def test_resize_signals_adjust_the_limit(self):
+        async def main():
+            admission = AdmissionController(2)
+            _install_resize_signals(admission)
+            limits = []
+            for signum in (signal.SIGUSR1, signal.SIGUSR1, signal.SIGUSR2):
+                os.kill(os.getpid(), signum)
+                for _ in range(10):
+                    await asyncio.sleep(0)
+                limits.append(admission.limit)
+            return limits
+
+        assert asyncio.run(main()) == [3, 4, 3]
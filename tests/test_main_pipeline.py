@@ -0,0 +1,355 @@
+"""Unit tests for main_pipeline helpers."""
+
+import asyncio
+import json
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import lib.main_pipeline as main_pipeline
+from lib.main_pipeline import (
+    BookPipeline,
+    PipelineConfig,
+    _citation_key,
+    _evict_done,
+    _load_partial_results,
+    _prompt_view,
+    _prompt_weight,
+    _select_excerpts,
+    _target_author_ids,
+)
+
+
+class TestTargetAuthorIds:
+    def test_single_author_id_wins(self):
+        assert _target_author_ids({"author_id": 3, "author_ids": ["1", "2"]}) == ["3"]
+
+    def test_author_ids_are_stringified_and_empties_dropped(self):
+        assert _target_author_ids({"author_ids": [1, None, "", "2"]}) == ["1", "2"]
+
+    def test_no_authors(self):
+        assert _target_author_ids({}) == []
+        assert _target_author_ids({"author_id": None, "author_ids": None}) == []
+
+
+class TestCitationKey:
+    def test_spelling_variants_share_a_key(self):
+        a = _citation_key({"title": "The Origin of Species", "author": "Charles Darwin"})
+        b = _citation_key({"title": "origin of species.", "author": "charles  darwin"})
+        assert a == b
+
+    def test_author_is_part_of_the_key(self):
+        a = _citation_key({"title": "Republic", "author": "Plato"})
+        assert a != _citation_key({"title": "Republic", "author": "Cicero"})
+        assert a != _citation_key({"title": "Republic"})
+
+
+class TestLoadPartialResults:
+    def test_missing_file(self, tmp_path):
+        assert _load_partial_results(tmp_path / "1.partial.jsonl") == []
+
+    def test_torn_last_line_is_skipped(self, tmp_path):
+        path = tmp_path / "1.partial.jsonl"
+        path.write_bytes(b'{"raw": {"title": "Republic"}}\n{"raw": {"title": "Laws"}}\n{"raw": {"ti')
+        assert [r["raw"]["title"] for r in _load_partial_results(path)] == ["Republic", "Laws"]
+
+
+class TestPromptWeight:
+    def test_counts_title_author_and_excerpts(self):
+        cit = {"title": "Republic", "author": "Plato", "contexts": ["abc", None], "commentaries": ["de"]}
+        assert _prompt_weight(cit) == len("Republic") + len("Plato") + 5
+
+    def test_missing_fields(self):
+        assert _prompt_weight({"title": None, "contexts": None}) == 0
+
+
+class TestSelectExcerpts:
+    def test_small_sets_are_kept_in_order(self):
+        assert _select_excerpts(["b", "a", "", "b"]) == ["b", "a"]
+
+    def test_near_repeats_lose_to_distinct_excerpts(self):
+        repeats = [f"as Plato says in the Republic {i}" for i in range(6)]
+        distinct = "justice is the advantage of the stronger"
+        chosen = _select_excerpts(repeats + [distinct], k=2)
+        assert len(chosen) == 2
+        assert distinct in chosen
+
+    def test_character_budget(self):
+        chosen = _select_excerpts(["x" * 50, "y" * 40, "z" * 30], k=3, budget=80)
+        assert chosen == ["x" * 50, "z" * 30]
+
+    def test_prompt_view_leaves_the_citation_untouched(self):
+        cit = {"title": "Republic", "contexts": [f"excerpt {i} " + "w" * i for i in range(8)]}
+        view = _prompt_view(cit)
+        assert len(view["contexts"]) == 5
+        assert len(cit["contexts"]) == 8
+
+
+class TestEvictDone:
+    @staticmethod
+    def _memo(states):
+        async def build():
+            loop = asyncio.get_running_loop()
+            memo = OrderedDict()
+            for key, done in states:
+                fut = loop.create_future()
+                if done:
+                    fut.set_result({})
+                memo[key] = fut
+            return memo
+
+        return asyncio.run(build())
+
+    def test_oldest_finished_entries_go_first(self):
+        memo = self._memo([(b"a", True), (b"b", True), (b"c", True)])
+        _evict_done(memo, 2)
+        assert list(memo) == [b"b", b"c"]
+
+    def test_pending_entries_are_kept(self):
+        memo = self._memo([(b"a", False), (b"b", True), (b"c", False), (b"d", True)])
+        _evict_done(memo, 2)
+        assert list(memo) == [b"a", b"c"]
+
+    def test_memo_may_exceed_limit_while_in_flight(self):
+        memo = self._memo([(b"a", False), (b"b", False), (b"c", True)])
+        _evict_done(memo, 1)
+        assert list(memo) == [b"a", b"b"]
+
+    def test_under_limit_is_untouched(self):
+        memo = self._memo([(b"a", True)])
+        _evict_done(memo, 1)
+        assert list(memo) == [b"a"]
+
+
+class _Handler:
+    """Stands in for a workflow handler: awaitable, with cancel_run()."""
+
+    def __init__(self, coro, cancelled):
+        self._task = asyncio.ensure_future(coro)
+        self._cancelled = cancelled
+
+    def __await__(self):
+        return self._task.__await__()
+
+    async def cancel_run(self):
+        self._task.cancel()
+        self._cancelled.append(True)
+
+
+class _FakeWorkflow:
+    def __init__(self, delays=None, gate=None):
+        self.delays = delays or {}
+        self.gate = gate
+        self.calls = []
+        self.cancel_runs = []
+        self.interrupted = []
+
+    def run(self, citation):
+        self.calls.append(citation["title"])
+
+        async def go():
+            try:
+                if self.gate is not None:
+                    await self.gate.wait()
+                await asyncio.sleep(self.delays.get(citation["title"], 0))
+            except asyncio.CancelledError:
+                self.interrupted.append(citation["title"])
+                raise
+            return {
+                "match_type": "book",
+                "metadata": {"book_id": citation["title"], "title": citation["title"], "original_year": 1900},
+            }
+
+        return _Handler(go(), self.cancel_runs)
+
+
+class _FakeEnricher:
+    async def resolve_citation_fallback(self, cit, meta):
+        return {"match_type": "not_found"}
+
+    async def enrich_book(self, *args):
+        return None
+
+    async def enrich_author(self, *args):
+        return None
+
+    def save(self):
+        pass
+
+
+def _pipeline(workflow, concurrency=3, timeout=5.0):
+    pipeline = object.__new__(BookPipeline)
+    pipeline.config = PipelineConfig(agent_concurrency=concurrency, agent_citation_timeout=timeout)
+    pipeline._workflow_results = OrderedDict()
+    pipeline.workflow = workflow
+    pipeline.enricher = _FakeEnricher()
+    pipeline.agent_semaphore = asyncio.Semaphore(concurrency)
+    return pipeline
+
+
+def _run_book(pipeline, tmp_path, citations, name="book"):
+    pre_path = tmp_path / f"{name}.pre.json"
+    final_path = tmp_path / f"{name}.json"
+    pre_path.write_text(json.dumps({"citations": citations}))
+
+    async def main():
+        await asyncio.wait_for(pipeline._run_workflow(pre_path, final_path, {"title": name}), 5)
+
+    asyncio.run(main())
+    return json.loads(final_path.read_text())["citations"]
+
+
+class TestRunWorkflow:
+    def test_every_citation_is_resolved(self, tmp_path):
+        workflow = _FakeWorkflow(delays={"Republic": 0.05})
+        citations = [{"title": t, "author": f"A{i}"} for i, t in enumerate(["Republic", "Ethics", "Laws", "Meno"])]
+        results = _run_book(_pipeline(workflow), tmp_path, citations)
+        assert sorted(r["raw"]["title"] for r in results) == ["Ethics", "Laws", "Meno", "Republic"]
+        assert all(r["edge"]["target_type"] == "book" for r in results)
+        assert not (tmp_path / "book.partial.jsonl").exists()
+
+    def test_slow_citation_does_not_hold_back_the_rest(self, tmp_path):
+        workflow = _FakeWorkflow(delays={"Republic": 0.1})
+        citations = [{"title": t, "author": "Plato"} for t in ["Republic", "Meno", "Laws"]]
+        results = _run_book(_pipeline(workflow, concurrency=2), tmp_path, citations)
+        # Results land in completion order: the slow one finishes last.
+        assert results[-1]["raw"]["title"] == "Republic"
+
+    def test_longest_prompts_are_dispatched_first(self, tmp_path):
+        workflow = _FakeWorkflow()
+        citations = [
+            {"title": "Meno", "author": "Plato"},
+            {"title": "Republic", "author": "Plato", "contexts": ["x" * 200]},
+            {"title": "Laws", "author": "Plato", "contexts": ["x" * 50]},
+        ]
+        _run_book(_pipeline(workflow, concurrency=1), tmp_path, citations)
+        assert workflow.calls == ["Republic", "Laws", "Meno"]
+
+    def test_timeout_cancels_the_run_and_records_an_error(self, tmp_path):
+        workflow = _FakeWorkflow(delays={"Republic": 1.0})
+        citations = [{"title": "Republic", "author": "Plato"}, {"title": "Meno", "author": "Plato"}]
+        results = _run_book(_pipeline(workflow, timeout=0.05), tmp_path, citations)
+        by_title = {r["raw"]["title"]: r["edge"]["target_type"] for r in results}
+        assert by_title == {"Republic": "error", "Meno": "book"}
+        assert workflow.cancel_runs == [True]
+        assert workflow.interrupted == ["Republic"]
+
+    def test_worker_error_propagates_instead_of_hanging(self, tmp_path, monkeypatch):
+        real_key = main_pipeline._citation_key
+
+        def key(cit):
+            if cit.get("title") == "Meno":
+                raise ValueError("bad citation")
+            return real_key(cit)
+
+        monkeypatch.setattr(main_pipeline, "_citation_key", key)
+        workflow = _FakeWorkflow(delays={"Republic": 1.0})
+        citations = [{"title": "Republic", "author": "Plato"}, {"title": "Meno", "author": "Plato"}]
+        with pytest.raises(ExceptionGroup) as excinfo:
+            _run_book(_pipeline(workflow), tmp_path, citations)
+        assert excinfo.group_contains(ValueError)
+        # The sibling worker's in-flight run was cancelled with it.
+        assert workflow.interrupted == ["Republic"]
+
+    def test_cancelling_the_book_cancels_its_workers(self, tmp_path):
+        gate = asyncio.Event()
+        workflow = _FakeWorkflow(gate=gate)
+        pipeline = _pipeline(workflow)
+        pre_path = tmp_path / "book.pre.json"
+        pre_path.write_text(json.dumps({"citations": [{"title": "Republic", "author": "Plato"}, {"title": "Meno", "author": "Plato"}]}))
+
+        async def main():
+            book = asyncio.create_task(pipeline._run_workflow(pre_path, tmp_path / "book.json", {"title": "book"}))
+            while len(workflow.calls) < 2:
+                await asyncio.sleep(0)
+            book.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await book
+
+        asyncio.run(main())
+        assert sorted(workflow.interrupted) == ["Meno", "Republic"]
+        assert not pipeline._workflow_results
+
+    def test_concurrent_books_share_one_run(self, tmp_path):
+        workflow = _FakeWorkflow(delays={"Republic": 0.05})
+        pipeline = _pipeline(workflow)
+        citations = [{"title": "Republic", "author": "Plato"}]
+        (tmp_path / "a.pre.json").write_text(json.dumps({"citations": citations}))
+        (tmp_path / "b.pre.json").write_text(json.dumps({"citations": citations}))
+
+        async def main():
+            await asyncio.gather(*(
+                pipeline._run_workflow(tmp_path / f"{n}.pre.json", tmp_path / f"{n}.json", {"title": n})
+                for n in "ab"
+            ))
+
+        asyncio.run(main())
+        assert workflow.calls == ["Republic"]
+        for n in "ab":
+            edges = json.loads((tmp_path / f"{n}.json").read_text())["citations"]
+            assert [e["edge"]["target_type"] for e in edges] == ["book"]
+
+    def test_cancelled_owner_does_not_break_waiters(self, tmp_path):
+        gate = asyncio.Event()
+        workflow = _FakeWorkflow(gate=gate)
+        pipeline = _pipeline(workflow)
+        citations = [{"title": "Republic", "author": "Plato"}]
+        (tmp_path / "a.pre.json").write_text(json.dumps({"citations": citations}))
+        (tmp_path / "b.pre.json").write_text(json.dumps({"citations": citations}))
+
+        async def main():
+            owner = asyncio.create_task(
+                pipeline._run_workflow(tmp_path / "a.pre.json", tmp_path / "a.json", {"title": "a"})
+            )
+            while not workflow.calls:
+                await asyncio.sleep(0)
+            waiter = asyncio.create_task(
+                pipeline._run_workflow(tmp_path / "b.pre.json", tmp_path / "b.json", {"title": "b"})
+            )
+            for _ in range(5):
+                await asyncio.sleep(0)
+            owner.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await owner
+            gate.set()
+            await asyncio.wait_for(waiter, 5)
+
+        asyncio.run(main())
+        # The waiter took over after the owner was cancelled.
+        assert workflow.calls == ["Republic", "Republic"]
+        assert workflow.interrupted == ["Republic"]
+        edges = json.loads((tmp_path / "b.json").read_text())["citations"]
+        assert [e["edge"]["target_type"] for e in edges] == ["book"]
+
+    def test_in_flight_results_survive_the_memo_cap(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(main_pipeline, "WORKFLOW_MEMO_SIZE", 1)
+        gate = asyncio.Event()
+        workflow = _FakeWorkflow(gate=gate)
+        pipeline = _pipeline(workflow)
+        citations = [{"title": t, "author": "Plato"} for t in ["Republic", "Meno", "Laws"]]
+        (tmp_path / "a.pre.json").write_text(json.dumps({"citations": citations}))
+        (tmp_path / "b.pre.json").write_text(json.dumps({"citations": citations}))
+
+        async def main():
+            books = [
+                asyncio.create_task(
+                    pipeline._run_workflow(tmp_path / f"{n}.pre.json", tmp_path / f"{n}.json", {"title": n})
+                )
+                for n in "ab"
+            ]
+            while len(workflow.calls) < 3:
+                await asyncio.sleep(0)
+            for _ in range(5):
+                await asyncio.sleep(0)
+            gate.set()
+            await asyncio.wait_for(asyncio.gather(*books), 5)
+
+        asyncio.run(main())
+        # All three stayed in flight past the cap, so book b coalesced onto them.
+        assert sorted(workflow.calls) == ["Laws", "Meno", "Republic"]
@@ -0,0 +1,60 @@
+"""Unit tests for the legacy process_citations_pipeline agent stage."""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+pipeline = pytest.importorskip("old.process_citations_pipeline")
+
+
+class _FakeCompletions:
+    def __init__(self, texts):
+        self.texts = texts
+
+    async def create(self, model, prompt, max_tokens, temperature):
+        return SimpleNamespace(choices=[
+            SimpleNamespace(index=i, text=self.texts[i]) for i in range(len(prompt))
+        ])
+
+
+def _complete(texts):
+    client = SimpleNamespace(completions=_FakeCompletions(texts))
+    return asyncio.run(pipeline.complete_prompts_batched(client, "m", ["p"] * len(texts), batch_size=8))
+
+
+class TestBatchedCompletions:
+    def test_fenced_completion_still_produces_a_record(self):
+        (response,) = _complete(['Here you go:\n```json\n{"result": "FOUND", "metadata": {"title": "Republic"}}\n```'])
+        record = pipeline.agent_record({"title": "Republic"}, response)
+        assert record is not None
+        assert json.loads(record)["agent_response"]["metadata"] == {"title": "Republic"}
+
+    def test_prose_becomes_an_unparseable_record(self):
+        (response,) = _complete(["I could not find this book."])
+        record = json.loads(pipeline.agent_record({"title": "Republic"}, response))
+        assert record["agent_response"]["result"] == "UNPARSEABLE"
+
+    def test_tool_calls_pass_through_for_resolution(self):
+        call = '<tool_call>{"name": "goodreads_book_lookup", "arguments": {"title": "Republic"}}'
+        assert _complete([call]) == [call]
+
+
+class TestIsCacheable:
+    def test_resolved_answers_are_cached(self):
+        assert pipeline.is_cacheable('{"result": "FOUND", "metadata": {"title": "Republic"}}')
+        assert pipeline.is_cacheable('{"result": "NOT_FOUND", "metadata": {}}')
+
+    def test_failures_are_not_cached(self):
+        assert not pipeline.is_cacheable('{"result": "UNPARSEABLE", "raw_response": "no idea"}')
+        assert not pipeline.is_cacheable("{}")
+        assert not pipeline.is_cacheable("I could not find this book.")
+        assert not pipeline.is_cacheable('<tool_call>{"name": "goodreads_book_lookup"}')
+        assert not pipeline.is_cacheable("[1, 2]")